@@ -1,4 +1,4 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 # --- Day 1: The Tyranny of the Rocket Equation ---
 # Santa has become stranded at the edge of the Solar System while delivering presents to other planets! To accurately calculate his position in space, safely align his warp drive, and return to Earth in time to save Christmas, he needs you to bring him measurements from fifty stars.
 # 
@@ -20,21 +20,66 @@
 # 
 # What is the sum of the fuel requirements for all of the modules on your spacecraft?
 
+try:
+    import numpy
+except ImportError:
+    # Only the batch tests use numpy here, mass_chunks reports it missing.
+    numpy = None
+from array import array
+
+from masses import mass_chunks
+
 def fuel(mass):
-    return (mass / 3) - 2
+    return (mass // 3) - 2
+
+def fuel_kernel(masses):
+    '''
+    The sum of fuel(mass) over masses using only int operations in a single
+    loop, for comparing interpreters.
+    '''
+    total = 0
+    for mass in masses:
+        total += mass // 3 - 2
+    return total
+
+def batch_fuel(masses, chunk_size=1 << 20):
+    '''
+    The sum of fuel(mass) over many masses, worked out a chunk at a time with
+    numpy.
+    '''
+    total = 0
+    for chunk in mass_chunks(masses, chunk_size):
+        total += int((chunk // 3 - 2).sum())
+    return total
 
 def test(mass):
     print(mass, " -> ", fuel(mass))
 
-test(12)
-test(14)
-test(1969)
-test(100756)
-
-with open("Input/1.txt") as in_file:
-    lines = in_file.readlines()
-total_fuel = 0
-for i, line in enumerate(lines):
-    mass = int(line.strip())
-    total_fuel += fuel(mass)
-print(total_fuel)
\ No newline at end of file
+def part_1(path="Input/1.txt"):
+    with open(path) as in_file:
+        lines = in_file.readlines()
+    total_fuel = 0
+    for i, line in enumerate(lines):
+        mass = int(line.strip())
+        total_fuel += fuel(mass)
+    return total_fuel
+
+def main():
+    test(12)
+    test(14)
+    test(1969)
+    test(100756)
+
+    total_fuel = part_1()
+    print(total_fuel)
+    with open("Input/1.txt") as in_file:
+        masses = [int(line) for line in in_file]
+    if numpy is not None:
+        assert batch_fuel(masses) == total_fuel
+        assert batch_fuel(array('l', masses), chunk_size=7) == total_fuel
+        assert batch_fuel(numpy.array(masses)) == total_fuel
+        assert batch_fuel([12, 14, 1969, 100756]) == 2 + 2 + 654 + 33583
+    assert fuel_kernel(masses) == total_fuel
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 # --- Part Two ---
 # During the second Go / No Go poll, the Elf in charge of the Rocket Equation Double-Checker stops the launch sequence. Apparently, you forgot to include additional fuel for the fuel you just added.
 # 
@@ -14,23 +14,136 @@
 # 1969 -> 966
 # 100756 -> 50346
 
+try:
+    import numpy
+except ImportError:
+    # Only the batch tests use numpy here, mass_chunks reports it missing.
+    numpy = None
+from array import array
+from collections import OrderedDict
+
+from masses import mass_chunks
+
 def fuel(mass):
-    current = (mass / 3) - 2
-    if (current <= 0):
-        return 0
-    return current + fuel(current)
+    total = 0
+    current = (mass // 3) - 2
+    while current > 0:
+        total += current
+        current = (current // 3) - 2
+    return total
+
+def total_fuel_kernel(masses):
+    '''
+    The sum of fuel(mass) over masses using only int operations in a single
+    loop, for comparing interpreters.
+    '''
+    total = 0
+    for mass in masses:
+        mass = mass // 3 - 2
+        while mass > 0:
+            total += mass
+            mass = mass // 3 - 2
+    return total
+
+class FuelCache:
+    '''
+    Works out fuel(mass), remembering the answer for every mass along each
+    chain of fuel so that masses whose chains share a tail reuse it. At most
+    max_size masses are kept, dropping the least recently used first.
+
+    hits and misses count cache lookups, for tuning max_size.
+    '''
+
+    def __init__(self, max_size=1 << 16):
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def fuel(self, mass):
+        cache = self.cache
+        # Walk down the chain until a cached mass or one needing no fuel.
+        chain = list()
+        known = 0
+        while True:
+            if mass in cache:
+                self.hits += 1
+                known = cache.pop(mass)
+                cache[mass] = known
+                break
+            self.misses += 1
+            current = mass // 3 - 2
+            if current <= 0:
+                break
+            chain.append((mass, current))
+            mass = current
+        # Then back up it, filling in the cache.
+        for mass, current in reversed(chain):
+            known += current
+            cache[mass] = known
+        while len(cache) > self.max_size:
+            cache.popitem(last=False)
+        return known
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self.cache),
+            "max_size": self.max_size,
+        }
+
+def batch_total_fuel(masses, chunk_size=1 << 20):
+    '''
+    The sum of fuel(mass) over many masses, worked out a chunk at a time with
+    numpy. Each round adds the next layer of fuel for every mass still
+    needing some, dropping the ones which have reached zero.
+    '''
+    total = 0
+    for chunk in mass_chunks(masses, chunk_size):
+        while len(chunk):
+            chunk = chunk // 3 - 2
+            chunk = chunk[chunk > 0]
+            total += int(chunk.sum())
+    return total
 
 def test(mass):
     print(mass, " -> ", fuel(mass))
 
-test(14)
-test(1969)
-test(100756)
-
-with open("Input/1.txt") as in_file:
-    lines = in_file.readlines()
-total_fuel = 0
-for i, line in enumerate(lines):
-    mass = int(line.strip())
-    total_fuel += fuel(mass)
-print(total_fuel)
\ No newline at end of file
+def part_2(path="Input/1.txt"):
+    with open(path) as in_file:
+        lines = in_file.readlines()
+    total_fuel = 0
+    for i, line in enumerate(lines):
+        mass = int(line.strip())
+        total_fuel += fuel(mass)
+    return total_fuel
+
+def main():
+    test(14)
+    test(1969)
+    test(100756)
+
+    total_fuel = part_2()
+    print(total_fuel)
+    with open("Input/1.txt") as in_file:
+        masses = [int(line) for line in in_file]
+    cache = FuelCache()
+    assert sum(cache.fuel(mass) for mass in masses) == total_fuel
+    assert sum(cache.fuel(mass) for mass in masses) == total_fuel
+    assert cache.stats()["hits"] >= len(masses)
+    cache = FuelCache(max_size=3)
+    assert [cache.fuel(mass) for mass in [1969, 100756, 1969, 14, 2]] == [966, 50346, 966, 2, 0]
+    assert len(cache.cache) == 3
+    assert FuelCache().fuel(10 ** 5000) == fuel(10 ** 5000)
+    assert total_fuel_kernel(masses) == total_fuel
+    if numpy is not None:
+        assert batch_total_fuel(masses) == total_fuel
+        assert batch_total_fuel(array('l', masses), chunk_size=7) == total_fuel
+        assert batch_total_fuel(numpy.array(masses)) == total_fuel
+        assert batch_total_fuel([14, 1969, 100756, 1]) == 2 + 966 + 50346
+
+if __name__ == "__main__":
+    main()
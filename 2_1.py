@@ -1,4 +1,4 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 # --- Day 2: 1202 Program Alarm --- On the way to your gravity assist around the
 # Moon, your ship computer beeps angrily about a "1202 program alarm". On the
 # radio, an Elf is already explaining how to handle the situation: "Don't worry,
@@ -128,44 +128,233 @@
 # 19690720. What is 100 * noun + verb? (For example, if noun=12 and verb=2, the
 # answer would be 1202.)
 
-class Program:
-    
+import multiprocessing
+from array import array
+
+import intcode_batch
+from intcode import IMAGE_TYPECODE, CompiledProgram, get_opcodes, run_compiled, run_program, run_shared
+from intcode_codegen import BlockCache, run_generated
+
+class Polynomial:
+    '''
+    A polynomial in the noun and verb, kept as a dict of
+    {(noun power, verb power): coefficient} with no zero coefficients.
+    '''
+
+    def __init__(self, terms):
+        self.terms = dict((powers, c) for powers, c in terms.items() if c != 0)
+
+    def __add__(self, other):
+        terms = dict(self.terms)
+        for powers, c in other.terms.items():
+            terms[powers] = terms.get(powers, 0) + c
+        return Polynomial(terms)
+
+    def __mul__(self, other):
+        terms = dict()
+        for (n_1, v_1), c_1 in self.terms.items():
+            for (n_2, v_2), c_2 in other.terms.items():
+                powers = (n_1 + n_2, v_1 + v_2)
+                terms[powers] = terms.get(powers, 0) + c_1 * c_2
+        return Polynomial(terms)
+
+    def __eq__(self, other):
+        return self.terms == other.terms
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "Polynomial(" + repr(self.terms) + ")"
+
+    def constant(self):
+        '''
+        The value if this doesn't depend on the noun or verb, otherwise None.
+        '''
+        if not self.terms:
+            return 0
+        if list(self.terms.keys()) == [(0, 0)]:
+            return self.terms[(0, 0)]
+        return None
+
+    def in_verb(self, noun):
+        '''
+        Substitute the noun, giving the coefficients of each power of the verb.
+        '''
+        coefficients = dict()
+        for (n, v), c in self.terms.items():
+            coefficients[v] = coefficients.get(v, 0) + c * noun ** n
+        return coefficients
+
+    def evaluate(self, noun, verb):
+        return sum(c * noun ** n * verb ** v for (n, v), c in self.terms.items())
+
+NOUN = Polynomial({(1, 0): 1})
+VERB = Polynomial({(0, 1): 1})
+
+class SymbolicProgram:
+    '''
+    Runs a program once with the noun and verb left unknown, so every memory
+    cell holds a Polynomial. Reading through an address that depends on the
+    inputs gives None, an unknown value, which is fine as long as it is
+    overwritten before it matters. A RuntimeError is raised if an opcode, a
+    destination or the output is unknown or depends on the inputs.
+    '''
+
     def __init__(self, opcodes):
-        self.opcodes = opcodes
-        self.opcode_table = {
-             1: self.add,
-             2: self.multiply,
-             99: self.halt
-        }
+        self.opcodes = [Polynomial({(0, 0): value}) for value in opcodes]
+        self.opcodes[1] = NOUN
+        self.opcodes[2] = VERB
+
+    def constant(self, index):
+        value = self.opcodes[index]
+        if value is not None:
+            value = value.constant()
+        if value is None:
+            raise RuntimeError("Value at index " + str(index) + " is not a constant")
+        return value
+
+    def read(self, index):
+        address = self.opcodes[index]
+        if address is not None:
+            address = address.constant()
+        if address is None:
+            return None
+        return self.opcodes[address]
 
     def run(self):
-        return self.run_recursive(0)
-
-    def run_recursive(self, index):
-        op = self.opcodes[index]
-        return self.opcode_table[op](index)
-
-    def add(self, index):
-        assert self.opcodes[index] == 1
-        self.opcodes[self.opcodes[index + 3]] = self.opcodes[self.opcodes[index + 1]] + self.opcodes[self.opcodes[index + 2]]
-        return self.run_recursive(index + 4)
-
-    def multiply(self, index):
-        assert self.opcodes[index] == 2
-        self.opcodes[self.opcodes[index + 3]] = self.opcodes[self.opcodes[index + 1]] * self.opcodes[self.opcodes[index + 2]]
-        return self.run_recursive(index + 4)
-
-    def halt(self, index):
-        assert self.opcodes[index] == 99
-        return self.opcodes[0]
-
-def run_program(opcodes, noun, verb):
-    modified_opcodes = opcodes[:]
-    modified_opcodes[1] = noun
-    modified_opcodes[2] = verb
-    program = Program(modified_opcodes)
-    # opcodes will be modified in place.
-    return program.run()
+        opcodes = self.opcodes
+        index = 0
+        while True:
+            op = self.constant(index)
+            if op == 99:
+                if opcodes[0] is None:
+                    raise RuntimeError("Output is not known")
+                return opcodes[0]
+            if op != 1 and op != 2:
+                raise RuntimeError("Unknown opcode " + str(op) + " at index " + str(index))
+            first = self.read(index + 1)
+            second = self.read(index + 2)
+            if first is None or second is None:
+                result = None
+            elif op == 1:
+                result = first + second
+            else:
+                result = first * second
+            opcodes[self.constant(index + 3)] = result
+            index += 4
+
+def solve_noun_verb(polynomial, target, nouns=range(100), verbs=range(100)):
+    '''
+    Find a (noun, verb) pair where the polynomial equals target, or None.
+    When it is linear in the verb each noun is solved directly, otherwise
+    each verb is tried against the polynomial rather than the program.
+    '''
+    verbs = list(verbs)
+    allowed = set(verbs)
+    for noun in nouns:
+        coefficients = polynomial.in_verb(noun)
+        if max(list(coefficients.keys()) + [0]) <= 1:
+            offset = coefficients.get(0, 0)
+            slope = coefficients.get(1, 0)
+            if slope == 0:
+                if offset == target and verbs:
+                    return noun, verbs[0]
+            elif (target - offset) % slope == 0 and (target - offset) // slope in allowed:
+                return noun, (target - offset) // slope
+            continue
+        for verb in verbs:
+            if sum(c * verb ** v for v, c in coefficients.items()) == target:
+                return noun, verb
+    return None
+
+def is_monotone(opcodes):
+    '''
+    Whether the program's output is a polynomial in the noun and verb with
+    no negative coefficients, so it never decreases as either grows from 0.
+    '''
+    try:
+        output = SymbolicProgram(opcodes).run()
+    except RuntimeError:
+        return False
+    return all(c >= 0 for c in output.terms.values())
+
+# Per process state for search_noun_verb, set up once by _search_init so the
+# program is decoded once per worker rather than once per task.
+_search = None
+
+def _search_init(opcodes, target, verbs, prune):
+    global _search
+    _search = (CompiledProgram(opcodes), target, verbs, prune)
+
+def _search_row(noun):
+    '''
+    Find a verb giving the target output for this noun, or None.
+    '''
+    compiled, target, verbs, prune = _search
+    if not prune:
+        for verb in verbs:
+            if run_compiled(compiled, noun, verb) == target:
+                return noun, verb
+        return None
+    # The output never decreases as the verb grows, so binary search the row.
+    low = 0
+    high = len(verbs) - 1
+    while low <= high:
+        middle = (low + high) // 2
+        output = run_compiled(compiled, noun, verbs[middle])
+        if output == target:
+            return noun, verbs[middle]
+        if output < target:
+            low = middle + 1
+        else:
+            high = middle - 1
+    return None
+
+def search_noun_verb(opcodes, target, nouns=range(100), verbs=range(100), processes=1, prune=None):
+    '''
+    Find a (noun, verb) pair making the program output target, or None.
+
+    By default this searches in this process. Passing more processes (None
+    for one per CPU) makes each noun one task, spread across a pool which is
+    terminated as soon as any task finds a match. Starting the pool costs
+    far more than a 100 by 100 search, so it only pays for bigger ranges,
+    and under the spawn and forkserver start methods the workers must be
+    able to import this file by name.
+
+    With prune the nouns and verbs must be ascending and the program must
+    only add and multiply non-negative values, so the output never
+    decreases as either input grows. Each row is then binary searched, and
+    the sequential search stops at the first noun already past the target.
+    Otherwise it can miss the answer, so by default (None) it is only used
+    when is_monotone shows it is safe.
+    '''
+    nouns = list(nouns)
+    verbs = list(verbs)
+    if prune is None:
+        prune = (
+            nouns == sorted(nouns) and verbs == sorted(verbs) and min(nouns + verbs + [0]) >= 0 and
+            is_monotone(opcodes)
+        )
+    if processes == 1:
+        _search_init(opcodes, target, verbs, prune)
+        compiled = _search[0]
+        for noun in nouns:
+            if prune and run_compiled(compiled, noun, verbs[0]) > target:
+                return None
+            found = _search_row(noun)
+            if found is not None:
+                return found
+        return None
+    pool = multiprocessing.Pool(processes, _search_init, (opcodes, target, verbs, prune))
+    try:
+        for found in pool.imap_unordered(_search_row, nouns):
+            if found is not None:
+                return found
+        return None
+    finally:
+        pool.terminate()
+        pool.join()
 
 def test(result, expected):
     assert len(result) == len(expected)
@@ -173,31 +362,65 @@ def test(result, expected):
         assert a == expected[i]
     print("Pass")
 
-def get_opcodes(path):
-    with open(path) as in_file:
-        line = in_file.readline()
-        input_opcode = line.split(",")
-        input_opcode = [int(opcode) for opcode in input_opcode]
-    return input_opcode
-
 def do_test():
     assert run_program([1, 0, 0, 0, 99], 0, 0) ==  2
     assert run_program([2, 3, 0, 3, 99], 3, 0) ==  2
     assert run_program([2,4,4,5,99,0], 4, 4) ==  2
     assert run_program([1,1,1,4,99,5,6,0,99], 1, 1) == 30
+    # Symbolic runs give the output in terms of the noun and verb.
+    assert SymbolicProgram([1, 0, 0, 3, 1, 1, 2, 0, 99]).run() == NOUN + VERB
+    output = SymbolicProgram([1, 0, 0, 3, 2, 1, 2, 0, 99]).run()
+    assert output == NOUN * VERB
+    assert output.evaluate(6, 7) == 42
+    assert solve_noun_verb(output, 42) == (1, 42)
+    assert solve_noun_verb(output * output, 36) == (1, 6)
+    assert solve_noun_verb(output, 10007) is None
+    try:
+        SymbolicProgram([1, 0, 0, 0, 99]).run()
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("Symbolic address not rejected")
 
-def part_1():
-    input_opcode = get_opcodes("Input/2.txt")
-    assert run_program(input_opcode, 12, 2) == 3760627
+def part_1(path="Input/2.txt"):
+    return run_program(get_opcodes(path), 12, 2)
 
-def part_2():
+def part_2(path="Input/2.txt"):
+    opcodes = get_opcodes(path)
+    try:
+        found = solve_noun_verb(SymbolicProgram(opcodes).run(), 19690720)
+    except RuntimeError:
+        # Not just adds and multiplies at fixed addresses, so run it instead.
+        found = search_noun_verb(opcodes, 19690720, processes=1)
+    noun, verb = found
+    return (100 * noun) + verb
+
+def main():
+    do_test()
     input_opcode = get_opcodes("Input/2.txt")
-    for noun in range(100):
-        for verb in range(100):
-            output = run_program(input_opcode, noun, verb)
-            if output == 19690720:
-                print noun, verb, (100 * noun) + verb
-
-do_test()
-part_1()
-part_2()
+    assert part_1() == 3760627
+    assert run_program(input_opcode, 12, 2, CompiledProgram) == 3760627
+    assert run_compiled(CompiledProgram(input_opcode), 12, 2) == 3760627
+    # Translated once, then loaded from .cache/intcode on later runs.
+    assert run_generated(BlockCache(input_opcode), input_opcode, 12, 2) == 3760627
+    assert SymbolicProgram(input_opcode).run().evaluate(12, 2) == 3760627
+    assert run_shared(array(IMAGE_TYPECODE, input_opcode), 12, 2) == 3760627
+
+    noun, verb = search_noun_verb(input_opcode, 19690720)
+    assert search_noun_verb(input_opcode, 19690720, processes=2) == (noun, verb)
+    assert search_noun_verb(input_opcode, 19690720, processes=1, prune=False) == (noun, verb)
+    assert is_monotone(input_opcode)
+    # The output here is 50 - noun + verb, so pruning would miss the answer.
+    falling = [1,0,0,20, 2,1,21,22, 1,22,23,0, 1,0,2,0, 99, 0,0,0, 0,-1,0,50]
+    assert not is_monotone(falling)
+    assert search_noun_verb(falling, 45, range(10), range(10), processes=1) == (5, 0)
+    assert search_noun_verb(falling, 45, range(10), range(10), processes=1, prune=True) is None
+    output = SymbolicProgram(input_opcode).run()
+    assert solve_noun_verb(output, 19690720) == (noun, verb)
+    if intcode_batch.numpy is not None:
+        assert intcode_batch.search_grid(input_opcode, 19690720) == (noun, verb)
+    assert part_2() == (100 * noun) + verb
+    print(noun, verb, (100 * noun) + verb)
+
+if __name__ == "__main__":
+    main()
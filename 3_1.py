@@ -1,4 +1,4 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 # --- Day 3: Crossed Wires ---
 # The gravity assist was successful, and you're well on your way to the Venus
 # refuelling station. During the rush back on Earth, the fuel management system
@@ -50,46 +50,309 @@
 # R98,U47,R26,D63,R33,U87,L62,D20,R33,U53,R51
 # U98,R91,D20,R16,D67,R40,U7,R15,U6,R7 = distance 135
 
-gl_intersection={(-1913, -274), (-1004, -148), (1003, -28), (446, 0), (-1767, -252), (-1913, -351), (-1106, -252), (-367, -693), (-1403, -252), (-1913, -505), (662, -28), (-367, -605), (-1423, -252), (-1139, -1069), (-1526, -1078), (-2380, -1521), (-2316, -988), (-1913, -670), (662, 350)}
-distances = dict()
-def make_line(directions):
+import io
+import sys
+from contextlib import nullcontext
+from bisect import bisect_left, bisect_right
+
+try:
+    import numpy
+except ImportError:
+    # The batch mode needs numpy, everything else works without it.
+    numpy = None
+
+# The (x, y) step for each direction.
+DIRECTIONS = {
+    "R": (1, 0),
+    "L": (-1, 0),
+    "U": (0, 1),
+    "D": (0, -1),
+}
+
+def read_directions(stream, chunk_size=1 << 16):
     '''
-    Pass in a list of directions as an iterable, and get back a list of points which make up the line.
-    e.g. [R5, U2, L3] -> [(0,0), (0,1), (0,2), (0,3), (0,4), (0,5), (2,5), (7,2)]
+    Lazily yield one wire's directions from a file-like object, reading at
+    most chunk_size characters at a time. Reading stops at the end of the
+    line, so calling this again on the same stream reads the next wire.
     '''
-    line = {(0,0)}
-    previous = (0, 0)
-    total = 0
+    partial = ""
+    while True:
+        chunk = stream.readline(chunk_size)
+        end = not chunk or chunk.endswith("\n")
+        tokens = (partial + chunk).split(",")
+        partial = tokens.pop()
+        for token in tokens:
+            token = token.strip()
+            if token:
+                yield token
+        if end:
+            partial = partial.strip()
+            if partial:
+                yield partial
+            return
+
+def iter_segments(directions):
+    '''
+    Pass in directions as an iterable, and lazily get back the straight
+    segments of the wire as (x_1, y_1, x_2, y_2, steps) running from (x_1, y_1)
+    to (x_2, y_2), where steps is how far along the wire (x_1, y_1) is.
+    e.g. [R5, U2] -> (0, 0, 5, 0, 0), (5, 0, 5, 2, 5)
+    '''
+    x = 0
+    y = 0
+    steps = 0
     for d in directions:
+        if d[0] not in DIRECTIONS:
+            raise RuntimeError("Unexpected direction " + d[0])
+        step_x, step_y = DIRECTIONS[d[0]]
         number = int(d[1:])
-        if d[0] == "R":
-            sign = 1
-            index = 0
-        elif d[0] == "L":
-            sign = -1
-            index = 0
-        elif d[0] == "U":
-            sign = 1
-            index = 1
-        elif d[0] == "D":
-            sign = -1
-            index = 1
+        end_x = x + step_x * number
+        end_y = y + step_y * number
+        yield x, y, end_x, end_y, steps
+        x = end_x
+        y = end_y
+        steps += number
+
+def make_segments(directions):
+    '''
+    The segments from iter_segments as a list.
+    e.g. [R5, U2] -> [(0, 0, 5, 0, 0), (5, 0, 5, 2, 5)]
+    '''
+    return list(iter_segments(directions))
+
+def steps_to(segment, x, y):
+    '''
+    How far along the wire (x, y) is, given it lies on segment.
+    '''
+    x_1, y_1, _, _, steps = segment
+    return steps + abs(x - x_1) + abs(y - y_1)
+
+class SegmentIndex:
+    '''
+    The segments of one wire, indexed to find where another wire meets them.
+    Horizontal and vertical segments are each sorted on the coordinate they
+    keep fixed, so a query only looks at those in the band it spans.
+    '''
+
+    def __init__(self, segments):
+        # [horizontal, vertical], each a list of (fixed, low, high, segment).
+        lines = ([], [])
+        for segment in segments:
+            x_1, y_1, x_2, y_2, _ = segment
+            if y_1 == y_2:
+                lines[0].append((y_1, min(x_1, x_2), max(x_1, x_2), segment))
+            else:
+                lines[1].append((x_1, min(y_1, y_2), max(y_1, y_2), segment))
+        for line in lines:
+            line.sort()
+        self.lines = lines
+        self.keys = ([line[0] for line in lines[0]], [line[0] for line in lines[1]])
+
+    def crossings(self, segment):
+        '''
+        Yield (x, y, steps) where segment meets the indexed wire, with steps
+        how far along the indexed wire (x, y) is. Where segments overlap only
+        the ends of the overlap and the points nearest the origin are given,
+        as the others can't be the nearest crossing or take the fewest steps.
+        '''
+        x_1, y_1, x_2, y_2, _ = segment
+        if y_1 == y_2:
+            orientation = 0
+            fixed = y_1
+            low, high = min(x_1, x_2), max(x_1, x_2)
         else:
+            orientation = 1
+            fixed = x_1
+            low, high = min(y_1, y_2), max(y_1, y_2)
+        def point(along):
+            if orientation == 0:
+                return along, fixed
+            return fixed, along
+        # Segments at right angles, fixed somewhere within low to high.
+        keys = self.keys[1 - orientation]
+        lines = self.lines[1 - orientation]
+        for i in range(bisect_left(keys, low), bisect_right(keys, high)):
+            along, other_low, other_high, other = lines[i]
+            if other_low <= fixed <= other_high:
+                x, y = point(along)
+                yield x, y, steps_to(other, x, y)
+        # Segments on the same line which overlap this one.
+        keys = self.keys[orientation]
+        lines = self.lines[orientation]
+        for i in range(bisect_left(keys, fixed), bisect_right(keys, fixed)):
+            _, other_low, other_high, other = lines[i]
+            start = max(low, other_low)
+            end = min(high, other_high)
+            if start > end:
+                continue
+            for along in {start, end, min(max(-1, start), end), min(max(0, start), end), min(max(1, start), end)}:
+                x, y = point(along)
+                yield x, y, steps_to(other, x, y)
+
+def closest_crossings(segments_1, segments_2):
+    '''
+    Find where two wires cross, other than at the origin, and give the
+    (Manhattan distance to the nearest crossing, fewest combined steps to a
+    crossing). Both are None if the wires don't cross.
+    '''
+    index = SegmentIndex(segments_1)
+    nearest = None
+    fewest = None
+    for segment in segments_2:
+        for x, y, steps in index.crossings(segment):
+            if x == 0 and y == 0:
+                continue
+            distance = abs(x) + abs(y)
+            if nearest is None or distance < nearest:
+                nearest = distance
+            steps += steps_to(segment, x, y)
+            if fewest is None or steps < fewest:
+                fewest = steps
+    return nearest, fewest
+
+def trace_wire(directions):
+    '''
+    Pass in a list of directions as an iterable, and get back every point the
+    wire passes through, mapped to the number of steps taken to first reach it.
+    e.g. [R2, U1] -> {(0, 0): 0, (1, 0): 1, (2, 0): 2, (2, 1): 3}
+    '''
+    steps = {(0, 0): 0}
+    x = 0
+    y = 0
+    total = 0
+    for d in directions:
+        if d[0] not in DIRECTIONS:
             raise RuntimeError("Unexpected direction " + d[0])
-        end = previous[index] + (sign * number)
-        while (True):
-            previous_list = list(previous)
-            previous_list[index] += sign
-            previous = tuple(previous_list)
+        step_x, step_y = DIRECTIONS[d[0]]
+        for _ in range(int(d[1:])):
+            x += step_x
+            y += step_y
             total += 1
-            if (previous in gl_intersection):
-                distances.setdefault(previous, 0)
-                distances[previous] += total
-                print previous, total
-            line.add(previous)
-            if previous[index] == end:
-                break
-    return line
+            if (x, y) not in steps:
+                steps[(x, y)] = total
+    return steps
+
+def make_line(directions):
+    '''
+    Pass in a list of directions as an iterable, and get back the set of points
+    which make up the line.
+    e.g. [R2, U1] -> {(0, 0), (1, 0), (2, 0), (2, 1)}
+    '''
+    return set(trace_wire(directions))
+
+def crossing_distances(steps_1, steps_2):
+    '''
+    Given two wires from trace_wire, find where they cross other than at the
+    origin and give the (Manhattan distance to the nearest crossing, fewest
+    combined steps to a crossing). Both are None if the wires don't cross.
+    '''
+    if len(steps_2) < len(steps_1):
+        steps_1, steps_2 = steps_2, steps_1
+    nearest = None
+    fewest = None
+    for point, steps in steps_1.items():
+        other = steps_2.get(point)
+        if other is None or point == (0, 0):
+            continue
+        distance = abs(point[0]) + abs(point[1])
+        if nearest is None or distance < nearest:
+            nearest = distance
+        if fewest is None or steps + other < fewest:
+            fewest = steps + other
+    return nearest, fewest
+
+def stream_crossings(stream, chunk_size=1 << 16):
+    '''
+    closest_crossings for the first two wires in a file-like object. Only the
+    first wire's segments are held in memory, and the second wire is checked
+    against them as it is read.
+    '''
+    return closest_crossings(
+        iter_segments(read_directions(stream, chunk_size)),
+        iter_segments(read_directions(stream, chunk_size))
+    )
+
+# Cells are coded as one 64 bit integer, x in the high half and y in the low,
+# which covers coordinates up to 2 ** 30 from the origin.
+CELL_OFFSET = 1 << 30
+CELL_MASK = (1 << 32) - 1
+
+def encode_cells(x, y):
+    return ((x + CELL_OFFSET) << 32) | (y + CELL_OFFSET)
+
+def decode_cells(codes):
+    return (codes >> 32) - CELL_OFFSET, (codes & CELL_MASK) - CELL_OFFSET
+
+def rasterise(directions):
+    '''
+    Every cell a wire passes through, other than the origin, as numpy arrays
+    of (sorted cell codes, steps taken to first reach each cell).
+    '''
+    for d in directions:
+        if d[0] not in DIRECTIONS:
+            raise RuntimeError("Unexpected direction " + d[0])
+    moves = numpy.array([DIRECTIONS[d[0]] for d in directions], dtype=numpy.int64).reshape(-1, 2)
+    counts = numpy.array([int(d[1:]) for d in directions], dtype=numpy.int64)
+    path = numpy.cumsum(numpy.repeat(moves, counts, axis=0), axis=0)
+    codes, first = numpy.unique(encode_cells(path[:, 0], path[:, 1]), return_index=True)
+    keep = codes != encode_cells(0, 0)
+    return codes[keep], first[keep] + 1
+
+def batch_crossings(wires):
+    '''
+    Find every crossing between every pair of wires, given a list of each
+    wire's directions. Gives numpy arrays of (first wire, second wire, x, y,
+    first wire's steps, second wire's steps), one entry per pair of wires
+    crossing at a cell, with first wire < second wire.
+
+    All the cells are sorted together, so cells shared by k wires form runs
+    of k and the pairs are found with array operations. The only Python
+    loop is over the distinct run lengths.
+    '''
+    rasters = [rasterise(directions) for directions in wires]
+    codes = numpy.concatenate([numpy.zeros(0, dtype=numpy.int64)] + [codes for codes, _ in rasters])
+    steps = numpy.concatenate([numpy.zeros(0, dtype=numpy.int64)] + [steps for _, steps in rasters])
+    ids = numpy.concatenate(
+        [numpy.zeros(0, dtype=numpy.int64)] +
+        [numpy.full(len(codes), i, dtype=numpy.int64) for i, (codes, _) in enumerate(rasters)]
+    )
+    # Stable, so each run keeps its wires in ascending order.
+    order = numpy.argsort(codes, kind="stable")
+    codes = codes[order]
+    steps = steps[order]
+    ids = ids[order]
+    starts = numpy.flatnonzero(numpy.r_[True, codes[1:] != codes[:-1]]) if len(codes) else codes
+    sizes = numpy.diff(numpy.r_[starts, len(codes)])
+    firsts = [numpy.zeros(0, dtype=numpy.int64)]
+    seconds = [numpy.zeros(0, dtype=numpy.int64)]
+    for size in numpy.unique(sizes[sizes > 1]):
+        run_starts = starts[sizes == size][:, numpy.newaxis]
+        a, b = numpy.triu_indices(size, 1)
+        firsts.append((run_starts + a).ravel())
+        seconds.append((run_starts + b).ravel())
+    first = numpy.concatenate(firsts)
+    second = numpy.concatenate(seconds)
+    x, y = decode_cells(codes[first])
+    return ids[first], ids[second], x, y, steps[first], steps[second]
+
+def batch_distances(wires):
+    '''
+    crossing_distances for every pair of wires which cross, as
+    {(first wire, second wire): (nearest, fewest)}.
+    '''
+    first, second, x, y, steps_1, steps_2 = batch_crossings(wires)
+    if not len(first):
+        return dict()
+    pairs = first * len(wires) + second
+    order = numpy.argsort(pairs, kind="stable")
+    pairs = pairs[order]
+    starts = numpy.flatnonzero(numpy.r_[True, pairs[1:] != pairs[:-1]])
+    nearest = numpy.minimum.reduceat((numpy.abs(x) + numpy.abs(y))[order], starts)
+    fewest = numpy.minimum.reduceat((steps_1 + steps_2)[order], starts)
+    return dict(
+        ((int(pair) // len(wires), int(pair) % len(wires)), (int(n), int(f)))
+        for pair, n, f in zip(pairs[starts], nearest, fewest)
+    )
 
 def changing_index(a, b):
     if a[0] == b[0]:
@@ -110,14 +373,13 @@ def find_intersections(line_1, line_2):
 def find_nearest(intersections):
     distances = [abs(i[0]) + abs(i[1]) for i in intersections]
     distances.sort()
-    print distances
     return distances[0]
 
 def test(result, expected):
     assert len(result) == len(expected)
     for i, a in enumerate(result):
         if (a != expected[i]):
-            print "Got \"", a, "\" Expected \"", expected[i], "\""
+            print("Got \"", a, "\" Expected \"", expected[i], "\"")
             raise RuntimeError("Test Failure")
     print("Pass")
 
@@ -129,16 +391,102 @@ def main_test():
     assert crossings == {(6,5), (3,3)}
     nearest = find_nearest(crossings)
     assert nearest == 6
+    for str_1, str_2, expected in [
+            ("R8,U5,L5,D3", "U7,R6,D4,L4", (6, 30)),
+            ("R75,D30,R83,U83,L12,D49,R71,U7,L72", "U62,R66,U55,R34,D71,R55,D58,R83", (159, 610)),
+            ("R98,U47,R26,D63,R33,U87,L62,D20,R33,U53,R51", "U98,R91,D20,R16,D67,R40,U7,R15,U6,R7", (135, 410))]:
+        segments_1 = make_segments(str_1.split(","))
+        segments_2 = make_segments(str_2.split(","))
+        assert closest_crossings(segments_1, segments_2) == expected
+        assert closest_crossings(segments_2, segments_1) == expected
+        steps_1 = trace_wire(str_1.split(","))
+        steps_2 = trace_wire(str_2.split(","))
+        assert crossing_distances(steps_1, steps_2) == expected
+    # Wires running along each other, including through the origin.
+    assert closest_crossings(make_segments(["R8"]), make_segments(["L2", "R10"])) == (1, 6)
+    assert closest_crossings(make_segments(["R8"]), make_segments(["U1", "R3", "D1", "R2"])) == (3, 8)
+    assert closest_crossings(make_segments(["R8"]), make_segments(["U1", "R3"])) == (None, None)
+    assert trace_wire(["R2", "U1", "D1"]) == {(0, 0): 0, (1, 0): 1, (2, 0): 2, (2, 1): 3}
+    assert crossing_distances(trace_wire(["R8"]), trace_wire(["L2", "R10"])) == (1, 6)
+    # Streaming copes with tokens split across reads and with blank space.
+    stream = io.StringIO("R75,D30,R83,U83,L12,D49,R71,U7,L72 \r\nU62,R66,U55,R34,D71,R55,D58,R83\n")
+    assert stream_crossings(stream, 4) == (159, 610)
+    stream = io.StringIO("R8,U5,L5,D3\nU7,R6,D4,L4")
+    assert list(read_directions(stream, 3)) == ["R8", "U5", "L5", "D3"]
+    assert list(read_directions(stream, 3)) == ["U7", "R6", "D4", "L4"]
+    assert list(read_directions(stream, 3)) == []
+    stdin = sys.stdin
+    try:
+        sys.stdin = io.StringIO("R8,U5,L5,D3\nU7,R6,D4,L4\n")
+        assert part_1("-") == 6
+        assert not sys.stdin.closed
+    finally:
+        sys.stdin = stdin
+    if numpy is not None:
+        wires = [
+            "R8,U5,L5,D3".split(","),
+            "U7,R6,D4,L4".split(","),
+            "R75,D30,R83,U83,L12,D49,R71,U7,L72".split(","),
+            "U62,R66,U55,R34,D71,R55,D58,R83".split(","),
+            "R8".split(","),
+            "L2,R10".split(","),
+        ]
+        distances = batch_distances(wires)
+        assert distances[(0, 1)] == (6, 30)
+        assert distances[(2, 3)] == (159, 610)
+        assert distances[(4, 5)] == (1, 6)
+        for (i, j), answers in distances.items():
+            assert answers == crossing_distances(trace_wire(wires[i]), trace_wire(wires[j]))
+        assert len(distances) == len([
+            (i, j) for i in range(len(wires)) for j in range(i + 1, len(wires))
+            if crossing_distances(trace_wire(wires[i]), trace_wire(wires[j])) != (None, None)
+        ])
+        assert batch_distances([["R1"], ["U1"]]) == dict()
 
-def main():
-    str_1 = "R1003,D138,L341,U798,L922,U153,R721,D177,L297,D559,L414,U470,L589,D179,L267,D954,R739,D414,L865,U688,R541,U242,R32,D607,L480,D401,L521,U727,L295,D154,R905,D54,L353,U840,L187,U942,R313,D143,R927,D962,R739,U152,R6,D9,L807,D67,R425,D235,L598,D107,L838,D522,L882,U780,L942,D29,R933,U129,L556,D11,L859,D455,L156,U673,L54,D141,R862,U88,R362,U742,L511,D408,R825,U622,R650,D393,L882,D969,R866,D232,L423,U371,L744,U35,L196,D189,R803,U663,R41,U741,R742,U929,L311,U30,R357,D776,L929,U85,R415,U540,R921,U599,R651,U79,R608,D620,L978,D92,L491,D310,L830,U656,R244,U72,L35,U768,R666,U356,R82,U596,L798,D455,L280,D626,R586,U668,R331,D245,L140,U3,R283,U813,R620,U975,L795,U477,L100,D94,R353,D732,R694,U702,L305,U497,R900,U810,L412,D954,R584,D444,L531,D875,R49,D328,L955,U227,L370,D548,L351,U571,R373,U743,R105,D226,L755,U325,R496,D960,L415,U262,R197,D508,R725,U930,L722,D162,L996,D610,R346,U680,L75,U211,R953,U147,R114,D48,L305,D284,L630,U575,R142,D518,R704,D820,L617,D118,R67,D674,L90,D916,L483,D598,L424,U92,R188,U413,L702,D262,R720,D995,L759,D732,L259,D814,L342,U642,L875,U726,R265,D143,R754,D235,L535,U1,R211,D720,R943,D726,L398,U636,R994,U653,L401,U877,R577,D460,L730,U889,R166,D641,L693,U490,L78,D80,R535,U551,L866,U283,L336,U586,L913,U474,R158,D220,R278,U11,R421,D661,R719,D696,R188,D735,L799,U391,R331,U581,R689,D82,R375,D125,R613,D705,L927,U18,R399,D352,L411,D777,L733,D884,R791,U973,R772,D878,R327,U215,L298,D360,R426,D872,L99,U78,L745,U59,L641,U73,L294,D247,R944,U512,L396"
-    str_2 = "L1004,D252,L909,D935,R918,D981,L251,U486,R266,U613,L546,D815,L789,D692,L550,U633,R485,U955,R693,D784,R974,U529,R926,U550,L742,U88,R647,D572,R832,D345,R98,D122,R634,U943,L956,U551,R295,U122,L575,U378,R652,U97,R129,D872,R275,D492,L530,D328,R761,U738,R836,U884,R636,U776,L951,D977,R980,U526,L824,U125,R778,D818,R281,U929,R907,U234,L359,D521,R294,U137,L607,U421,L7,U582,R194,U979,L941,D999,R442,D330,L656,U410,R753,U704,R834,D61,R775,U750,R891,D989,R856,D944,R526,D44,R227,U938,R130,D280,L721,D171,R763,D677,L643,U931,L489,U250,L779,U552,R796,U220,R465,U700,L459,U766,R501,D16,R555,U257,R122,U452,L197,U905,L486,D726,L551,U487,R785,U470,L879,U149,L978,D708,R18,U211,L652,D141,L99,D190,L982,U556,R861,U745,L786,U674,R706,U986,R554,D39,R881,D626,R885,U907,R196,U532,L297,U232,L508,U283,L236,U613,L551,U647,R679,U760,L435,D475,R916,U669,R788,U922,R107,D503,R687,D282,L940,U835,L226,U421,L64,U245,R977,D958,L866,D328,R215,D532,R350,D199,R872,U373,R415,U463,L132,U225,L144,U786,R658,D535,R263,U263,R48,D420,L407,D177,L496,U521,R47,D356,L503,D557,R220,D879,L12,U853,R265,U983,L221,U235,R46,D906,L271,U448,L464,U258,R952,D976,L949,D526,L458,D753,L408,U222,R256,U885,R986,U622,R503,D5,L659,D553,R311,U783,L541,U17,R267,U767,L423,D501,R357,D160,L316,D912,R303,U648,L182,U342,L185,U743,L559,U816,R24,D203,R608,D370,R25,U883,L72,D816,L877,U990,R49,U331,L482,U37,L585,D327,R268,D106,L224,U401,L203,D734,L695,U910,L417,U105,R135,U876,L194,U723,L282,D966,R246,U447,R966,U346,L636,D9,L480,D35,R96"
-    line_1 = make_line(str_1.split(","))
-    line_2 = make_line(str_2.split(","))
-    crossings = find_intersections(line_1, line_2)
-    val = distances.values()
-    val.sort()
-    print val
+def open_wires(path):
+    '''
+    Open a file of wires, one per line, or stdin when path is "-". stdin is
+    left open afterwards.
+    '''
+    if path == "-":
+        return nullcontext(sys.stdin)
+    return open(path)
+
+def read_wires(path):
+    '''
+    The directions for each wire in a file, one wire per line.
+    '''
+    with open_wires(path) as in_file:
+        return [line.strip().split(",") for line in in_file if line.strip()]
+
+def main(path="Input/3.txt"):
+    with open_wires(path) as in_file:
+        print(stream_crossings(in_file))
+
+def main_batch(path):
+    '''
+    Report the crossings between every pair of wires in a file, any number of
+    wires, one per line.
+    '''
+    for (i, j), (nearest, fewest) in sorted(batch_distances(read_wires(path)).items()):
+        print("Wires " + str(i) + " and " + str(j) + ": nearest " + str(nearest) + ", fewest steps " + str(fewest))
+
+def part_1(path="Input/3.txt"):
+    with open_wires(path) as in_file:
+        return stream_crossings(in_file)[0]
+
+def part_2(path="Input/3.txt"):
+    with open_wires(path) as in_file:
+        return stream_crossings(in_file)[1]
 
-#main_test()
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main_test()
+    # python3 3_1.py [wires.txt] solves the first two wires in a file, and
+    # python3 3_1.py --batch wires.txt reports every pair. A file of - reads
+    # stdin.
+    if len(sys.argv) == 3 and sys.argv[1] == "--batch":
+        main_batch(sys.argv[2])
+    elif len(sys.argv) == 2:
+        main(sys.argv[1])
+    else:
+        main()
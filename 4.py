@@ -1,4 +1,4 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 # --- Day 4: Secure Container ---
 # You arrive at the Venus fuel depot only to discover it's protected by a
 # password. The Elves had written the password on a sticky note, but someone
@@ -33,38 +33,302 @@
 # different passwords within the range given in your puzzle input meet all of
 # the criteria?
 
+import multiprocessing
+from itertools import groupby
+
+try:
+    import numpy
+except ImportError:
+    # Only the block functions need numpy.
+    numpy = None
+
 def try_range(start, end):
+    '''
+    Yield each valid password in range(start, end).
+    '''
     assert end > start
-    valid = list()
     for number in range(start, end):
         if valid_password(number):
-            valid.append(number)
-    return valid
+            yield number
+
+def count_range(start, end):
+    '''
+    The number of valid passwords in range(start, end), by checking each one.
+    '''
+    return sum(1 for _ in try_range(start, end))
 
 def valid_password(number):
     '''
-    Is this a valid password by the above rules
+    Is this a valid password by the above rules. The digits are read from the
+    right with integer arithmetic, checking both rules in one pass without
+    building anything.
     '''
-    split = [int(i) for i in str(number)]
-    sort_split = split[:]
-    sort_split.sort()
-    if split == sort_split:
-        digits = dict()
-        for digit in sort_split:
-            if digit in digits:
-                digits[digit] += 1
+    # Going right to left the digits must never increase.
+    previous = 10
+    run = 0
+    pair = False
+    while number:
+        digit = number % 10
+        number //= 10
+        if digit > previous:
+            return False
+        if digit == previous:
+            run += 1
+        else:
+            if run == 2:
+                pair = True
+            run = 1
+        previous = digit
+    return pair or run == 2
+
+def valid_block(numbers):
+    '''
+    valid_password for a whole numpy array of numbers at once, giving an
+    array of bools.
+    '''
+    numbers = numpy.asarray(numbers, dtype=numpy.int64)
+    width = len(str(int(numbers.max()))) if len(numbers) else 1
+    powers = 10 ** numpy.arange(width - 1, -1, -1, dtype=numpy.int64)
+    digits = (numbers[:, None] // powers) % 10
+    # Give leading zeros distinct negative values, so they count as
+    # increasing and never as a repeat.
+    leading = numbers[:, None] < powers
+    leading[:, -1] = False
+    digits = numpy.where(leading, numpy.arange(-width, 0), digits)
+    never_decreasing = (digits[:, 1:] >= digits[:, :-1]).all(axis=1)
+    # A pair at i is digits i and i + 1 matching, without a match either side.
+    padding = numpy.zeros((len(numbers), 1), dtype=bool)
+    same = numpy.hstack([padding, digits[:, 1:] == digits[:, :-1], padding])
+    pair = (same[:, 1:-1] & ~same[:, :-2] & ~same[:, 2:]).any(axis=1)
+    return never_decreasing & pair
+
+def count_blocks(start, end, block_size=1 << 16):
+    '''
+    count_range using valid_block on block_size numbers at a time.
+    '''
+    total = 0
+    for block_start in range(start, end, block_size):
+        block = numpy.arange(block_start, min(block_start + block_size, end), dtype=numpy.int64)
+        total += int(valid_block(block).sum())
+    return total
+
+def non_decreasing(start, end):
+    '''
+    Yield the digits of every number in range(start, end) whose digits never
+    decrease, as tuples in ascending order. Only those numbers are generated,
+    a few thousand for six digits, with whole branches skipped once they fall
+    outside the range.
+    '''
+    start = max(start, 1)
+    if end <= start:
+        return
+    for length in range(len(str(start)), len(str(end - 1)) + 1):
+        for digits in extend_non_decreasing((), 0, length, start, end):
+            yield digits
+
+def extend_non_decreasing(prefix, value, remaining, start, end):
+    '''
+    Yield each non-decreasing way of adding remaining digits to prefix, whose
+    value is value, that lands in range(start, end).
+    '''
+    if remaining == 0:
+        yield prefix
+        return
+    remaining -= 1
+    scale = 10 ** remaining
+    # 11...1 with one digit for each still to be added.
+    ones = (scale - 1) // 9
+    for digit in range(prefix[-1] if prefix else 1, 10):
+        extended = value * 10 + digit
+        if extended * scale + 9 * ones < start:
+            continue
+        if extended * scale + digit * ones >= end:
+            break
+        for digits in extend_non_decreasing(prefix + (digit,), extended, remaining, start, end):
+            yield digits
+
+def has_exact_pair(digits):
+    '''
+    Do the sorted digits have a digit repeated exactly twice
+    '''
+    return any(len(list(group)) == 2 for _, group in groupby(digits))
+
+def count_passwords(start, end):
+    '''
+    The number of valid passwords in range(start, end), the same as
+    count_range(start, end) but without scanning the whole range.
+    '''
+    return sum(1 for digits in non_decreasing(start, end) if has_exact_pair(digits))
+
+# Rules for passwords, which can be combined with compile_rules. Each one is
+# a tuple so rule sets can be sent to other processes.
+NON_DECREASING = ("non_decreasing",)
+
+def run_of_exactly(k):
+    '''
+    Some digit is repeated exactly k times in a row.
+    '''
+    return ("run_of_exactly", k)
+
+def run_of_at_least(k):
+    '''
+    Some digit is repeated at least k times in a row.
+    '''
+    return ("run_of_at_least", k)
+
+def length(n):
+    '''
+    The password has n digits.
+    '''
+    return ("length", n)
+
+PART_1_RULES = (NON_DECREASING, run_of_at_least(2), length(6))
+PART_2_RULES = (NON_DECREASING, run_of_exactly(2), length(6))
+
+def compile_rules(rules):
+    '''
+    Combine rules into one function taking a number and returning whether it
+    meets all of them. The digits are read once, from the right, collecting
+    what the rules need: whether they never decrease, the lengths of runs of
+    a repeated digit, and how many there are.
+    '''
+    ordered = False
+    exactly = set()
+    at_least = 0
+    lengths = set()
+    for rule in rules:
+        if rule == NON_DECREASING:
+            ordered = True
+        elif rule[0] == "run_of_exactly":
+            exactly.add(rule[1])
+        elif rule[0] == "run_of_at_least":
+            at_least = max(at_least, rule[1])
+        elif rule[0] == "length":
+            lengths.add(rule[1])
+        else:
+            raise ValueError("Unknown rule " + repr(rule))
+    if len(lengths) > 1:
+        return lambda number: False
+    def predicate(number):
+        previous = 10
+        run = 0
+        longest = 0
+        found = set()
+        digits = 0
+        while number:
+            digit = number % 10
+            number //= 10
+            digits += 1
+            if ordered and digit > previous:
+                return False
+            if digit == previous:
+                run += 1
             else:
-                digits[digit] = 1
-        return 2 in digits.values()
-    return False
+                if run in exactly:
+                    found.add(run)
+                longest = max(longest, run)
+                run = 1
+            previous = digit
+        if run in exactly:
+            found.add(run)
+        longest = max(longest, run)
+        if lengths and digits not in lengths:
+            return False
+        return longest >= at_least and len(found) == len(exactly)
+    return predicate
+
+def count_matching(rules, start, end):
+    '''
+    The number of passwords in range(start, end) meeting rules. If they have
+    to be non-decreasing only those numbers are generated, otherwise the
+    whole range is checked.
+    '''
+    predicate = compile_rules(rules)
+    if NON_DECREASING in rules:
+        return sum(
+            1 for digits in non_decreasing(start, end)
+            if predicate(int("".join(str(digit) for digit in digits)))
+        )
+    return sum(1 for number in range(start, end) if predicate(number))
+
+def _count_task(task):
+    return count_matching(*task)
+
+def parallel_count(rule_sets, start, end, processes=None, chunks=None):
+    '''
+    count_matching for each of several rule sets over range(start, end), as
+    a list of counts. The range is split into chunks (by default four per
+    process) and every (rule set, chunk) pair is counted in a pool of
+    processes, None for one per CPU, then the counts are added up.
+    '''
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if chunks is None:
+        chunks = 4 * processes
+    pool = multiprocessing.Pool(processes)
+    try:
+        size = max(1, -(-(end - start) // chunks))
+        bounds = [(low, min(low + size, end)) for low in range(start, end, size)]
+        tasks = [(tuple(rules), low, high) for rules in rule_sets for low, high in bounds]
+        counts = pool.map(_count_task, tasks)
+    finally:
+        pool.terminate()
+        pool.join()
+    return [sum(counts[i * len(bounds):(i + 1) * len(bounds)]) for i in range(len(rule_sets))]
+
+# The puzzle input, as range() bounds.
+PUZZLE_RANGE = (307237, 769058)
+
+def read_range(path):
+    '''
+    The bounds of a range written as start-end in a file, or the puzzle input
+    if there is no file.
+    '''
+    if path is None:
+        return PUZZLE_RANGE
+    with open(path) as in_file:
+        start, end = in_file.read().strip().split("-")
+    return int(start), int(end)
+
+def part_1(path=None):
+    return count_matching(PART_1_RULES, *read_range(path))
+
+def part_2(path=None):
+    return count_passwords(*read_range(path))
+
+def do_test():
+    assert valid_password(111122)
+    assert not valid_password(123444)
+    assert valid_password(112233)
+    assert not valid_password(333346)
+    assert valid_password(388999)
+    assert list(non_decreasing(95, 125)) == [(9, 9), (1, 1, 1), (1, 1, 2), (1, 1, 3), (1, 1, 4), (1, 1, 5), (1, 1, 6), (1, 1, 7), (1, 1, 8), (1, 1, 9), (1, 2, 2), (1, 2, 3), (1, 2, 4)]
+    for start, end in [(1, 30000), (111111, 111112), (307237, 310000), (99990, 100011)]:
+        assert count_passwords(start, end) == count_range(start, end)
+        if numpy is not None:
+            assert count_blocks(start, end, 1000) == count_range(start, end)
+    assert not valid_password(0)
+    assert valid_password(11) and not valid_password(111) and not valid_password(21)
+    rules_2 = compile_rules(PART_2_RULES)
+    for number in [111122, 123444, 112233, 333346, 388999, 111111, 223450, 123789]:
+        assert rules_2(number) == valid_password(number)
+    rules_1 = compile_rules(PART_1_RULES)
+    assert rules_1(111111) and not rules_1(223450) and not rules_1(123789) and rules_1(123444)
+    assert not rules_1(11111) and not rules_1(1111111)
+    assert compile_rules([run_of_exactly(3), run_of_exactly(2)])(1112233)
+    assert not compile_rules([run_of_exactly(3), run_of_exactly(2)])(1111223)
+    assert compile_rules([run_of_at_least(3)])(9991)
+    assert count_matching([run_of_at_least(2)], 10, 100) == 9
 
-assert valid_password(111122)
-assert not valid_password(123444)
-assert valid_password(112233)
-assert not valid_password(333346)
-assert valid_password(388999)
 
+def main():
+    do_test()
+    valid = count_range(*PUZZLE_RANGE)
+    print(valid)
+    assert part_2() == valid
+    assert parallel_count([PART_2_RULES, PART_1_RULES], *PUZZLE_RANGE) == [valid, part_1()]
+    if numpy is not None:
+        assert count_blocks(*PUZZLE_RANGE) == valid
 
-valid = try_range(307237, 769058)
-print(valid)
-print(len(valid))
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 # --- Day 5: Sunny with a Chance of Asteroids --- 
 # 
 # You're starting to sweat as the ship makes its way toward Mercury. The Elves
@@ -86,46 +86,57 @@
 #
 # After providing 1 to the only input instruction and passing all the tests,
 # what diagnostic code does the program produce?
+#
+# --- Part Two ---
+#
+# The air conditioner comes online, but the thermal radiators need more. The
+# TEST diagnostic program needs four more instructions, and the instruction
+# pointer is no longer always moved by the length of the instruction:
+#
+# Opcode 5 is jump-if-true: if the first parameter is non-zero, it sets the
+# instruction pointer to the value from the second parameter. Otherwise, it
+# does nothing.
+#
+# Opcode 6 is jump-if-false: if the first parameter is zero, it sets the
+# instruction pointer to the value from the second parameter. Otherwise, it
+# does nothing.
+#
+# Opcode 7 is less than: if the first parameter is less than the second
+# parameter, it stores 1 in the position given by the third parameter.
+# Otherwise, it stores 0.
+#
+# Opcode 8 is equals: if the first parameter is equal to the second parameter,
+# it stores 1 in the position given by the third parameter. Otherwise, it
+# stores 0.
+#
+# Instructions which jump don't then move the instruction pointer. This time,
+# provide the ID 5 for the ship's thermal radiator controller. What is the
+# diagnostic code for system ID 5?
 
+import sys
 
-class Program:
-    
-    def __init__(self, opcodes):
-        self.opcodes = opcodes
-        self.opcode_table = {
-             1: self.add,
-             2: self.multiply,
-             99: self.halt
-        }
-
-    def run(self):
-        return self.run_recursive(0)
-
-    def run_recursive(self, index):
-        op = self.opcodes[index]
-        return self.opcode_table[op](index)
-
-    def add(self, index):
-        assert self.opcodes[index] == 1
-        self.opcodes[self.opcodes[index + 3]] = self.opcodes[self.opcodes[index + 1]] + self.opcodes[self.opcodes[index + 2]]
-        return self.run_recursive(index + 4)
-
-    def multiply(self, index):
-        assert self.opcodes[index] == 2
-        self.opcodes[self.opcodes[index + 3]] = self.opcodes[self.opcodes[index + 1]] * self.opcodes[self.opcodes[index + 2]]
-        return self.run_recursive(index + 4)
+from intcode import Program, get_opcodes
 
-    def halt(self, index):
-        assert self.opcodes[index] == 99
-        return self.opcodes[0]
+def run_diagnostic(opcodes, system_id):
+    '''
+    Run a TEST diagnostic program for a system, returning all its outputs.
+    '''
+    program = Program(opcodes[:], [system_id])
+    program.run()
+    return program.outputs
 
-def run_program(opcodes, noun, verb):
-    modified_opcodes = opcodes[:]
-    modified_opcodes[1] = noun
-    modified_opcodes[2] = verb
-    program = Program(modified_opcodes)
-    # opcodes will be modified in place.
-    return program.run()
+def run_diagnostics(paths, system_id):
+    '''
+    Run several TEST diagnostic programs, giving {path: diagnostic code}.
+    Every output before the diagnostic code must be 0.
+    '''
+    codes = dict()
+    for path in paths:
+        outputs = run_diagnostic(get_opcodes(path), system_id)
+        if not outputs or any(outputs[:-1]):
+            raise RuntimeError("Diagnostic " + path + " failed with " + str(outputs))
+        codes[path] = outputs[-1]
+    return codes
 
 def test(result, expected):
     assert len(result) == len(expected)
@@ -133,31 +144,37 @@ def test(result, expected):
         assert a == expected[i]
     print("Pass")
 
-def get_opcodes(path):
-    with open(path) as in_file:
-        line = in_file.readline()
-        input_opcode = line.split(",")
-        input_opcode = [int(opcode) for opcode in input_opcode]
-    return input_opcode
-
 def do_test():
-    assert run_program([1, 0, 0, 0, 99], 0, 0) ==  2
-    assert run_program([2, 3, 0, 3, 99], 3, 0) ==  2
-    assert run_program([2,4,4,5,99,0], 4, 4) ==  2
-    assert run_program([1,1,1,4,99,5,6,0,99], 1, 1) == 30
+    assert run_diagnostic([3,0,4,0,99], 7) == [7]
+    # Comparisons and jumps, [(program, [(input, expected output)])].
+    for opcodes, cases in [
+            ([3,9,8,9,10,9,4,9,99,-1,8], [(8, 1), (7, 0)]),
+            ([3,9,7,9,10,9,4,9,99,-1,8], [(7, 1), (8, 0)]),
+            ([3,3,1108,-1,8,3,4,3,99], [(8, 1), (9, 0)]),
+            ([3,3,1107,-1,8,3,4,3,99], [(7, 1), (9, 0)]),
+            ([3,12,6,12,15,1,13,14,13,4,13,99,-1,0,1,9], [(0, 0), (5, 1)]),
+            ([3,3,1105,-1,9,1101,0,0,12,4,12,99,1], [(0, 0), (5, 1)]),
+            ([3,21,1008,21,8,20,1005,20,22,107,8,21,20,1006,20,31,
+              1106,0,36,98,0,0,1002,21,125,20,4,20,1105,1,46,104,
+              999,1105,1,46,1101,1000,1,20,4,20,1105,1,46,98,99],
+             [(7, 999), (8, 1000), (9, 1001)])]:
+        for value, expected in cases:
+            assert run_diagnostic(opcodes, value) == [expected]
+
+def part_1(path="Input/5.txt"):
+    return run_diagnostics([path], 1)[path]
 
-def part_1():
-    input_opcode = get_opcodes("Input/2.txt")
-    assert run_program(input_opcode, 12, 2) == 3760627
+def part_2(path="Input/5.txt"):
+    return run_diagnostics([path], 5)[path]
 
-def part_2():
-    input_opcode = get_opcodes("Input/2.txt")
-    for noun in range(100):
-        for verb in range(100):
-            output = run_program(input_opcode, noun, verb)
-            if output == 19690720:
-                print noun, verb, (100 * noun) + verb
+def main():
+    do_test()
+    path = sys.argv[1] if len(sys.argv) > 1 else "Input/5.txt"
+    try:
+        print(part_1(path))
+        print(part_2(path))
+    except OSError as e:
+        print("Couldn't read input, " + str(e))
 
-do_test()
-part_1()
-part_2()
+if __name__ == "__main__":
+    main()
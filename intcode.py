@@ -0,0 +1,779 @@
+#!/usr/bin/env python3
+# The Intcode computer, shared by the Day 2 and Day 5 solutions.
+#
+# An Intcode program is a list of integers which is also the computer's memory.
+# Each instruction is an opcode followed by its parameters, and the opcode's
+# hundreds, thousands and ten-thousands digits give the parameter modes: 0 for
+# position mode (the parameter is an address) and 1 for immediate mode (the
+# parameter is the value).
+#
+# Program runs the full instruction set. CompiledProgram is a faster engine for
+# Day 2 style programs, which only add, multiply and halt. CopyOnWriteMemory
+# lets many runs share one program image.
+#
+# Machine runs a program whose State can be paused when it needs input,
+# resumed, and snapshotted cheaply, so one run can be forked into many and
+# many machines can take turns in one process, see multiplex.
+#
+# Run this file to test the computer, and see intcode_benchmark.py to measure
+# it.
+
+import mmap
+import os
+import re
+import queue
+from array import array
+from collections import deque
+from copy import copy
+
+# Program images are arrays of 64 bit integers.
+IMAGE_TYPECODE = 'q'
+
+# The number of parameters each opcode takes.
+PARAMETER_COUNTS = {
+    1: 3,
+    2: 3,
+    3: 1,
+    4: 1,
+    5: 2,
+    6: 2,
+    7: 3,
+    8: 3,
+    99: 0,
+}
+
+def make_decode_table():
+    '''
+    Map every valid raw instruction value to (opcode, modes), where modes is a
+    tuple with one mode per parameter, so decoding is a single dict lookup.
+    '''
+    table = dict()
+    for opcode, count in PARAMETER_COUNTS.items():
+        mode_sets = [()]
+        for _ in range(count):
+            mode_sets = [modes + (mode,) for modes in mode_sets for mode in (0, 1)]
+        for modes in mode_sets:
+            raw = opcode
+            for position, mode in enumerate(modes):
+                raw += mode * 10 ** (position + 2)
+            table[raw] = (opcode, modes)
+    return table
+
+DECODE_TABLE = make_decode_table()
+
+def make_reader(source):
+    '''
+    Turn an input source into a function returning the next value. The source
+    can be a queue (anything with get), a function, or an iterable.
+    '''
+    if source is None:
+        source = ()
+    if hasattr(source, "get"):
+        return source.get
+    if callable(source):
+        return source
+    iterator = iter(source)
+    def read():
+        for value in iterator:
+            return value
+        raise RuntimeError("Program needs more input")
+    return read
+
+def make_writer(sink):
+    '''
+    Turn an output sink into a function taking each value. The sink can be a
+    queue (anything with put), a function, or a list.
+    '''
+    if hasattr(sink, "put"):
+        return sink.put
+    if callable(sink):
+        return sink
+    return sink.append
+
+class Program:
+    
+    def __init__(self, opcodes, inputs=None, outputs=None, max_instructions=None):
+        '''
+        inputs and outputs are where opcodes 3 and 4 read and write, see
+        make_reader and make_writer. Without outputs, values are collected in
+        self.outputs.
+        '''
+        self.opcodes = opcodes
+        self.read = make_reader(inputs)
+        if outputs is None:
+            outputs = list()
+        self.outputs = outputs
+        self.write = make_writer(outputs)
+        # Stop with an error after this many instructions, None for no limit.
+        self.max_instructions = max_instructions
+        self.executed = 0
+        self.opcode_table = {
+             1: self.add,
+             2: self.multiply,
+             3: self.input,
+             4: self.output,
+             5: self.jump_if_true,
+             6: self.jump_if_false,
+             7: self.less_than,
+             8: self.equals,
+             99: self.halt
+        }
+
+    def run(self):
+        '''
+        Fetch, decode and execute instructions until a halt. Each handler
+        returns the index of the next instruction, or None to stop, so the
+        stack depth stays constant however long the program runs.
+        '''
+        opcodes = self.opcodes
+        opcode_table = self.opcode_table
+        budget = self.max_instructions
+        executed = 0
+        index = 0
+        while index is not None:
+            if budget is not None and executed >= budget:
+                self.executed = executed
+                raise RuntimeError(
+                    "Instruction budget of " + str(budget) + " exhausted at index " + str(index)
+                )
+            try:
+                op, modes = DECODE_TABLE[opcodes[index]]
+            except KeyError:
+                self.executed = executed
+                raise RuntimeError("Unknown instruction " + str(opcodes[index]) + " at index " + str(index))
+            index = opcode_table[op](index, modes)
+            executed += 1
+        self.executed = executed
+        return opcodes[0]
+
+    def parameter(self, index, mode):
+        '''
+        The value of the parameter at index, in position (0) or immediate (1)
+        mode.
+        '''
+        if mode:
+            return self.opcodes[index]
+        return self.opcodes[self.opcodes[index]]
+
+    def add(self, index, modes):
+        self.opcodes[self.opcodes[index + 3]] = self.parameter(index + 1, modes[0]) + self.parameter(index + 2, modes[1])
+        return index + 4
+
+    def multiply(self, index, modes):
+        self.opcodes[self.opcodes[index + 3]] = self.parameter(index + 1, modes[0]) * self.parameter(index + 2, modes[1])
+        return index + 4
+
+    def input(self, index, modes):
+        self.opcodes[self.opcodes[index + 1]] = self.read()
+        return index + 2
+
+    def output(self, index, modes):
+        self.write(self.parameter(index + 1, modes[0]))
+        return index + 2
+
+    def jump_if_true(self, index, modes):
+        if self.parameter(index + 1, modes[0]) != 0:
+            return self.parameter(index + 2, modes[1])
+        return index + 3
+
+    def jump_if_false(self, index, modes):
+        if self.parameter(index + 1, modes[0]) == 0:
+            return self.parameter(index + 2, modes[1])
+        return index + 3
+
+    def less_than(self, index, modes):
+        less = self.parameter(index + 1, modes[0]) < self.parameter(index + 2, modes[1])
+        self.opcodes[self.opcodes[index + 3]] = 1 if less else 0
+        return index + 4
+
+    def equals(self, index, modes):
+        equal = self.parameter(index + 1, modes[0]) == self.parameter(index + 2, modes[1])
+        self.opcodes[self.opcodes[index + 3]] = 1 if equal else 0
+        return index + 4
+
+    def halt(self, index, modes):
+        return None
+
+class CompiledProgram:
+    '''
+    Same interface as Program, but the program is decoded up front into
+    (opcode, first, second, destination) tuples with the operand addresses
+    already resolved. Every instruction is four values long and execution
+    starts at 0, so instruction slot n covers addresses 4n to 4n + 3 and a
+    write to address a only ever has to drop slot a >> 2 for it to be decoded
+    again the next time it is reached.
+
+    Decoding costs about as much as running an instruction, so nothing is
+    decoded up front: an instruction runs straight from memory the first
+    time it is reached and is only decoded the second time. Without jumps
+    that never happens in a single run, which is then only a little faster
+    than Program. The real gain is decoding an image once and running copies
+    of it many times, see copy() and patch(), as Day 2 sweeps do;
+    intcode_benchmark.py measures both.
+    '''
+
+    HALT = (99, 0, 0, 0)
+    # In a slot which has run once since it was last written.
+    SEEN = ()
+
+    def __init__(self, opcodes, max_instructions=None, decoded=None):
+        self.opcodes = opcodes
+        self.max_instructions = max_instructions
+        self.executed = 0
+        self.prepared = decoded is not None
+        if decoded is not None:
+            self.decoded = decoded[:]
+        else:
+            self.decoded = [None] * ((len(opcodes) >> 2) + 1)
+
+    def prepare(self):
+        '''
+        Decode straight-line code from the start up to the first halt, so
+        copies don't each decode it again.
+        '''
+        opcodes = self.opcodes
+        index = 0
+        while index < len(opcodes) and opcodes[index] in (1, 2):
+            self.decode(index)
+            index += 4
+        if index < len(opcodes) and opcodes[index] == 99:
+            self.decode(index)
+        self.prepared = True
+
+    def copy(self):
+        '''
+        A fresh program with its own memory, reusing the decoded instructions.
+        '''
+        if not self.prepared:
+            self.prepare()
+        return CompiledProgram(self.opcodes[:], self.max_instructions, self.decoded)
+
+    def patch(self, address, value):
+        self.opcodes[address] = value
+        self.decoded[address >> 2] = None
+
+    def decode(self, index):
+        opcodes = self.opcodes
+        op = opcodes[index]
+        if op == 99:
+            instruction = self.HALT
+        elif op == 1 or op == 2:
+            instruction = (op, opcodes[index + 1], opcodes[index + 2], opcodes[index + 3])
+        else:
+            raise RuntimeError("Unknown opcode " + str(op) + " at index " + str(index))
+        self.decoded[index >> 2] = instruction
+        return instruction
+
+    def run(self):
+        opcodes = self.opcodes
+        decoded = self.decoded
+        budget = self.max_instructions
+        # executed never reaches -1, so no limit costs a single comparison.
+        limit = -1 if budget is None else budget
+        executed = 0
+        index = 0
+        while True:
+            if executed == limit:
+                self.executed = executed
+                raise RuntimeError(
+                    "Instruction budget of " + str(budget) + " exhausted at index " + str(index)
+                )
+            instruction = decoded[index >> 2]
+            if not instruction:
+                # Not decoded, which is done inline as a method call would
+                # double the cost.
+                op = opcodes[index]
+                if op == 99:
+                    instruction = self.HALT
+                elif op != 1 and op != 2:
+                    self.executed = executed
+                    raise RuntimeError("Unknown opcode " + str(op) + " at index " + str(index))
+                elif instruction is None:
+                    # The first run, straight from memory.
+                    destination = opcodes[index + 3]
+                    if op == 1:
+                        opcodes[destination] = opcodes[opcodes[index + 1]] + opcodes[opcodes[index + 2]]
+                    else:
+                        opcodes[destination] = opcodes[opcodes[index + 1]] * opcodes[opcodes[index + 2]]
+                    executed += 1
+                    decoded[index >> 2] = self.SEEN
+                    decoded[destination >> 2] = None
+                    index += 4
+                    continue
+                else:
+                    instruction = (op, opcodes[index + 1], opcodes[index + 2], opcodes[index + 3])
+                decoded[index >> 2] = instruction
+            op, first, second, destination = instruction
+            executed += 1
+            if op == 1:
+                opcodes[destination] = opcodes[first] + opcodes[second]
+            elif op == 2:
+                opcodes[destination] = opcodes[first] * opcodes[second]
+            else:
+                break
+            decoded[destination >> 2] = None
+            index += 4
+        self.executed = executed
+        return opcodes[0]
+
+class CopyOnWriteMemory:
+    '''
+    Memory for one run of a shared program image. Reads come from the image,
+    an array of 64 bit integers or a list if a value doesn't fit, until the
+    first write to a page, which copies just that page into this run's own
+    overlay. Pages are about a
+    64th of the image, so a run which only writes to a small part of a large
+    image only copies that part.
+
+    This doesn't pay on small images which runs write all over, like Day 2's:
+    its runs touch most of the image anyway, and every read is a Python
+    method call rather than a list lookup, so run_shared is several times
+    slower there than copying the image with run_program, see
+    intcode_benchmark.py. Its use is cheap snapshots, see State.
+
+    Pages are shared the same way between a memory and its snapshots: pages
+    holds every page written so far and writable the ones this memory has
+    its own copy of.
+    '''
+
+    # Pages are between 16 and 4096 values long.
+    MIN_PAGE_BITS = 4
+    MAX_PAGE_BITS = 12
+
+    def __init__(self, image):
+        if not isinstance(image, array):
+            try:
+                image = array(IMAGE_TYPECODE, image)
+            except OverflowError:
+                # Too big for 64 bits, like parse_image's fallback.
+                image = list(image)
+        self.image = image
+        self.pages = dict()
+        self.writable = dict()
+        bits = (len(image) >> 6).bit_length()
+        self.page_bits = min(max(bits, self.MIN_PAGE_BITS), self.MAX_PAGE_BITS)
+        self.page_size = 1 << self.page_bits
+        self.page_mask = self.page_size - 1
+
+    def __len__(self):
+        return len(self.image)
+
+    def __getitem__(self, address):
+        page = self.pages.get(address >> self.page_bits)
+        if page is None:
+            return self.image[address]
+        return page[address & self.page_mask]
+
+    def __setitem__(self, address, value):
+        number = address >> self.page_bits
+        page = self.writable.get(number)
+        if page is None:
+            shared = self.pages.get(number)
+            if shared is not None:
+                page = shared[:]
+            else:
+                if not 0 <= address < len(self.image):
+                    raise IndexError("Address " + str(address) + " out of range")
+                start = number << self.page_bits
+                page = self.image[start:start + self.page_size]
+                if isinstance(page, array):
+                    page = page.tolist()
+            self.pages[number] = page
+            self.writable[number] = page
+        page[address & self.page_mask] = value
+
+    def snapshot(self):
+        '''
+        A copy of this memory which costs one dict copy. Both share every
+        page until one of them writes to it.
+        '''
+        memory = CopyOnWriteMemory(self.image)
+        memory.pages = dict(self.pages)
+        self.writable = dict()
+        return memory
+
+    def tolist(self):
+        values = list(self.image)
+        for number, page in self.pages.items():
+            start = number << self.page_bits
+            values[start:start + len(page)] = page
+        return values
+
+class State:
+    '''
+    Everything about a run of a program: its memory, the instruction pointer,
+    the input waiting to be read and the output written so far, and whether
+    it is running, waiting for input or halted.
+
+    inputs is a deque, add to it to give the program more input. outputs can
+    be anything with append, such as another State's inputs to connect two
+    programs.
+    '''
+
+    RUNNING = "running"
+    WAITING = "waiting"
+    HALTED = "halted"
+
+    def __init__(self, memory, inputs=(), outputs=None):
+        if not isinstance(memory, CopyOnWriteMemory):
+            memory = CopyOnWriteMemory(memory)
+        self.memory = memory
+        self.ip = 0
+        self.inputs = deque(inputs)
+        if outputs is None:
+            outputs = list()
+        self.outputs = outputs
+        self.executed = 0
+        self.status = self.RUNNING
+
+    def snapshot(self):
+        '''
+        An independent copy of this state, sharing memory pages until either
+        writes to them. Pending input and output are copied, so a snapshot
+        of a connected state isn't connected to anything.
+        '''
+        state = State(self.memory.snapshot(), self.inputs, copy(self.outputs))
+        state.ip = self.ip
+        state.executed = self.executed
+        state.status = self.status
+        return state
+
+    def restore(self, snapshot):
+        '''
+        Go back to a snapshot, which is left as it is so it can be restored
+        again.
+        '''
+        state = snapshot.snapshot()
+        self.memory = state.memory
+        self.ip = state.ip
+        self.inputs = state.inputs
+        self.outputs = state.outputs
+        self.executed = state.executed
+        self.status = state.status
+
+class _NeedInput(Exception):
+    pass
+
+class Machine(Program):
+    '''
+    A Program running on a State, which pauses instead of failing when it
+    needs input that hasn't been given yet.
+    '''
+
+    def __init__(self, state):
+        if not isinstance(state, State):
+            state = State(state)
+        Program.__init__(self, state.memory)
+        self.state = state
+        self.read = self.read_input
+
+    def read_input(self):
+        inputs = self.state.inputs
+        if not inputs:
+            raise _NeedInput()
+        return inputs.popleft()
+
+    def run(self, steps=None):
+        '''
+        Run until the program halts or needs more input, or after steps
+        instructions, giving the state's status. Run again to carry on.
+        '''
+        state = self.state
+        if state.status == State.HALTED:
+            return state.status
+        # The state may have been restored since the last run.
+        opcodes = self.opcodes = state.memory
+        self.write = make_writer(state.outputs)
+        opcode_table = self.opcode_table
+        executed = 0
+        index = state.ip
+        status = State.RUNNING
+        try:
+            while steps is None or executed < steps:
+                try:
+                    op, modes = DECODE_TABLE[opcodes[index]]
+                except KeyError:
+                    raise RuntimeError("Unknown instruction " + str(opcodes[index]) + " at index " + str(index))
+                next_index = opcode_table[op](index, modes)
+                executed += 1
+                if next_index is None:
+                    status = State.HALTED
+                    break
+                index = next_index
+        except _NeedInput:
+            status = State.WAITING
+        finally:
+            state.ip = index
+            state.executed += executed
+            self.executed = state.executed
+        state.status = status
+        return status
+
+def multiplex(machines, steps=1000):
+    '''
+    Run many machines in turn, steps instructions at a time, until every one
+    has halted or is waiting for input nobody is going to give it. Connect
+    machines by making one's outputs another's inputs. Gives each machine's
+    status.
+    '''
+    progress = True
+    while progress:
+        progress = False
+        for machine in machines:
+            state = machine.state
+            if state.status == State.HALTED:
+                continue
+            if state.status == State.WAITING and not state.inputs:
+                continue
+            executed = state.executed
+            machine.run(steps)
+            if state.executed != executed:
+                progress = True
+    return [machine.state.status for machine in machines]
+
+def run_kernel(opcodes):
+    '''
+    Run a program which only adds, multiplies and halts, in place, giving
+    opcodes[0]. This is the Day 2 hot path as one loop of int operations on
+    a list, with no method calls or decoding, for comparing interpreters such
+    as CPython and PyPy.
+    '''
+    index = 0
+    while True:
+        op = opcodes[index]
+        if op == 1:
+            opcodes[opcodes[index + 3]] = opcodes[opcodes[index + 1]] + opcodes[opcodes[index + 2]]
+        elif op == 2:
+            opcodes[opcodes[index + 3]] = opcodes[opcodes[index + 1]] * opcodes[opcodes[index + 2]]
+        elif op == 99:
+            return opcodes[0]
+        else:
+            raise RuntimeError("Unknown opcode " + str(op) + " at index " + str(index))
+        index += 4
+
+def run_program(opcodes, noun, verb, program_class=Program):
+    modified_opcodes = opcodes[:]
+    modified_opcodes[1] = noun
+    modified_opcodes[2] = verb
+    program = program_class(modified_opcodes)
+    # opcodes will be modified in place.
+    return program.run()
+
+def run_shared(image, noun, verb, program_class=Program):
+    '''
+    run_program without copying the program. image is read but never
+    written, so it should be converted to an array once and reused. This is
+    slower than run_program for small images, see CopyOnWriteMemory.
+    '''
+    memory = CopyOnWriteMemory(image)
+    memory[1] = noun
+    memory[2] = verb
+    return program_class(memory).run()
+
+def run_compiled(compiled, noun, verb):
+    '''
+    run_program for an already decoded CompiledProgram, which is left
+    untouched so it can be reused.
+    '''
+    program = compiled.copy()
+    program.patch(1, noun)
+    program.patch(2, verb)
+    return program.run()
+
+# Anything between commas and whitespace, so values can be split over lines.
+VALUE = re.compile(br"[^,\s]+")
+
+# Parsed images, {absolute path: (modification time, size, image)}.
+_image_cache = dict()
+
+def parse_image(data):
+    '''
+    Parse comma separated values from a bytes-like object, such as an mmap,
+    into an array of 64 bit integers. If a value doesn't fit the image is a
+    list of Python ints instead.
+    '''
+    values = (int(match.group()) for match in VALUE.finditer(data))
+    image = array(IMAGE_TYPECODE)
+    for value in values:
+        try:
+            image.append(value)
+        except OverflowError:
+            # Keep what's been parsed and carry on with unbounded ints.
+            image = image.tolist()
+            image.append(value)
+            image.extend(values)
+            break
+    return image
+
+def load_image(path):
+    '''
+    Load a program straight from a memory mapped file, see parse_image. The
+    result is cached until the file's modification time or size changes, so
+    it is shared and must not be modified; use CopyOnWriteMemory or copy it.
+    '''
+    path = os.path.abspath(path)
+    status = os.stat(path)
+    cached = _image_cache.get(path)
+    if cached is not None and cached[:2] == (status.st_mtime, status.st_size):
+        return cached[2]
+    with open(path, "rb") as in_file:
+        if status.st_size == 0:
+            image = array(IMAGE_TYPECODE)
+        else:
+            data = mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                image = parse_image(data)
+            finally:
+                data.close()
+    _image_cache[path] = (status.st_mtime, status.st_size, image)
+    return image
+
+def get_opcodes(path):
+    '''
+    A program as a new list, which is free to be modified.
+    '''
+    return list(load_image(path))
+
+def do_test():
+    assert run_program([1, 0, 0, 0, 99], 0, 0) ==  2
+    assert run_program([1,1,1,4,99,5,6,0,99], 1, 1) == 30
+    # Long programs must not be limited by the recursion limit.
+    count = 5000
+    counter = 4 * count + 1
+    long_program = [1, counter, counter + 1, counter] * count + [99, 0, 1]
+    program = Program(long_program[:])
+    program.run()
+    assert program.opcodes[counter] == count
+    assert program.executed == count + 1
+    try:
+        Program(long_program[:], max_instructions=10).run()
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("Instruction budget not enforced")
+    # The compiled engine must agree with the interpreter, including when the
+    # program overwrites its own instructions.
+    for opcodes, noun, verb in [
+            ([1, 0, 0, 0, 99], 0, 0),
+            ([2, 3, 0, 3, 99], 3, 0),
+            ([2,4,4,5,99,0], 4, 4),
+            ([1,1,1,4,99,5,6,0,99], 1, 1),
+            (long_program, long_program[1], long_program[2])]:
+        assert run_program(opcodes, noun, verb, CompiledProgram) == run_program(opcodes, noun, verb)
+        assert run_compiled(CompiledProgram(opcodes), noun, verb) == run_program(opcodes, noun, verb)
+    program = CompiledProgram(long_program[:])
+    program.run()
+    assert program.opcodes[counter] == count
+    for opcodes in [[1,1,1,4,99,5,6,0,99], long_program, get_opcodes("Input/2.txt")]:
+        assert run_kernel(opcodes[:]) == Program(opcodes[:]).run()
+    # Copy on write runs match ordinary ones and leave the image alone.
+    image = array(IMAGE_TYPECODE, long_program)
+    memory = CopyOnWriteMemory(image)
+    assert Program(memory).run() == 1
+    assert memory[counter] == count
+    assert image[counter] == 0
+    assert len(memory.pages) == 1
+    assert len(memory.pages[counter >> memory.page_bits]) < len(image) // 32
+    expected = long_program[:]
+    expected[counter] = count
+    assert memory.tolist() == expected
+    for opcodes, noun, verb in [
+            ([1, 0, 0, 0, 99], 0, 0),
+            ([2, 3, 0, 3, 99], 3, 0),
+            ([2,4,4,5,99,0], 4, 4),
+            ([1,1,1,4,99,5,6,0,99], 1, 1)]:
+        image = array(IMAGE_TYPECODE, opcodes)
+        assert run_shared(image, noun, verb) == run_program(opcodes, noun, verb)
+        assert run_shared(image, noun, verb, CompiledProgram) == run_program(opcodes, noun, verb)
+        assert image.tolist() == opcodes
+    # Parameter modes.
+    program = Program([1002,4,3,4,33])
+    program.run()
+    assert program.opcodes[4] == 99
+    program = Program([1101,100,-1,4,0])
+    program.run()
+    assert program.opcodes[4] == 99
+    # Input and output through a list, a function and a queue.
+    program = Program([3,0,4,0,99], [7])
+    program.run()
+    assert program.outputs == [7]
+    outputs = list()
+    Program([3,0,4,0,99], lambda: 8, outputs.append).run()
+    assert outputs == [8]
+    inputs = queue.Queue()
+    outputs = queue.Queue()
+    inputs.put(9)
+    Program([3,0,4,0,99], inputs, outputs).run()
+    assert outputs.get_nowait() == 9
+    try:
+        Program([3,0,4,0,99]).run()
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("Missing input not reported")
+    # Loading copes with values split over lines and trailing whitespace, and
+    # falls back to Python ints for values which don't fit in 64 bits.
+    assert parse_image(b"1,0,\n0,3,\r\n99 \n\n").tolist() == [1, 0, 0, 3, 99]
+    assert parse_image(b"1,-2,99").tolist() == [1, -2, 99]
+    assert parse_image(b"1," + str(2 ** 70).encode() + b",3") == [1, 2 ** 70, 3]
+    assert parse_image(b"").tolist() == []
+    image = load_image("Input/2.txt")
+    assert load_image("Input/2.txt") is image
+    # Snapshots share pages until written.
+    memory = CopyOnWriteMemory(array(IMAGE_TYPECODE, range(200)))
+    memory[0] = -1
+    saved = memory.snapshot()
+    memory[1] = -2
+    saved[100] = -3
+    assert memory.tolist()[:2] == [-1, -2] and memory[100] == 100
+    assert saved.tolist()[:2] == [-1, 1] and saved[100] == -3
+    assert len(saved.pages) == 2
+    # Images with values too big for an array are kept as lists.
+    memory = CopyOnWriteMemory([1, 2 ** 70, 3])
+    memory[0] = 2 ** 80
+    assert memory.tolist() == [2 ** 80, 2 ** 70, 3] and memory[1] == 2 ** 70
+    machine = Machine([104, 2 ** 70, 99])
+    assert machine.run() == State.HALTED and machine.state.outputs == [2 ** 70]
+    # Machines pause for input, and resume where they left off.
+    double = [3,11,1002,11,2,12,4,12,1105,1,0,0,0]
+    machine = Machine(double)
+    assert machine.run() == State.WAITING
+    machine.state.inputs.append(4)
+    assert machine.run() == State.WAITING
+    saved = machine.state.snapshot()
+    machine.state.inputs.append(5)
+    assert machine.run() == State.WAITING
+    assert machine.state.outputs == [8, 10]
+    # Forks from a snapshot carry on independently, without rerunning it.
+    forks = list()
+    for value in (6, 7):
+        fork = Machine(saved.snapshot())
+        fork.state.inputs.append(value)
+        fork.run()
+        forks.append(fork.state.outputs)
+    assert forks == [[8, 12], [8, 14]]
+    machine.state.restore(saved)
+    machine.state.inputs.append(1)
+    machine.run()
+    assert machine.state.outputs == [8, 2]
+    # A long run can be stopped and carried on.
+    program = Machine(long_program)
+    assert program.run(steps=100) == State.RUNNING
+    assert program.run() == State.HALTED
+    assert program.state.memory[counter] == count
+    assert program.state.executed == count + 1
+    # Day 7's feedback loop, five machines connected in a ring.
+    amplifier = [3,26,1001,26,-4,26,3,27,1002,27,2,27,1,27,26,27,4,27,1001,28,-1,28,1005,28,6,99,0,0,5]
+    amplifier_image = array(IMAGE_TYPECODE, amplifier)
+    states = [State(amplifier_image, [phase]) for phase in (9, 8, 7, 6, 5)]
+    for state, next_state in zip(states, states[1:] + states[:1]):
+        state.outputs = next_state.inputs
+    states[0].inputs.append(0)
+    machines = [Machine(state) for state in states]
+    assert multiplex(machines, steps=3) == [State.HALTED] * 5
+    assert list(states[0].inputs) == [139629729]
+    assert get_opcodes("Input/2.txt") == image.tolist()
+    print("Pass")
+
+if __name__ == "__main__":
+    do_test()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# Runs many copies of an Intcode program in lockstep with numpy.
+#
+# BatchProgram holds N memories as the rows of one (N, L) int64 array, with an
+# instruction pointer per row. Each step fetches every running row's
+# instruction at once, and for each opcode present runs it on all the rows
+# which have it, fetching and writing operands with fancy indexing. Rows which
+# jump somewhere else just carry on from there, masked out of the opcodes
+# they aren't running. A row with a bad address or instruction is stopped as
+# faulted rather than stopping the rest.
+#
+# For Day 2 every row runs the same instructions, so a grid of 10,000 nouns
+# and verbs costs about as many numpy calls as one run. Values are 64 bit, so
+# unlike Program they wrap around on overflow.
+#
+# Run this file to test it.
+
+try:
+    import numpy
+except ImportError:
+    # Nothing here works without numpy, but importing this shouldn't fail.
+    numpy = None
+
+from intcode import DECODE_TABLE, get_opcodes, run_program
+
+RUNNING = 0
+HALTED = 1
+FAULTED = 2
+
+class BatchProgram:
+    '''
+    Runs each row of memory, an (N, L) array, as a separate program. inputs
+    is an (N, K) array of the values each row's input instructions read in
+    turn. Rows still running after max_steps steps are left running.
+    '''
+
+    def __init__(self, memory, inputs=None, max_steps=None):
+        self.memory = numpy.array(memory, dtype=numpy.int64)
+        count, self.length = self.memory.shape
+        self.ip = numpy.zeros(count, dtype=numpy.int64)
+        self.status = numpy.full(count, RUNNING, dtype=numpy.int8)
+        if inputs is None:
+            inputs = numpy.zeros((count, 0), dtype=numpy.int64)
+        self.inputs = numpy.asarray(inputs, dtype=numpy.int64)
+        self.input_index = numpy.zeros(count, dtype=numpy.int64)
+        # (rows, values) for each step with an output, see outputs().
+        self.output_log = list()
+        self.max_steps = max_steps
+        self.steps = 0
+        self.valid = numpy.array(sorted(DECODE_TABLE), dtype=numpy.int64)
+
+    def run(self):
+        '''
+        Step until no row is running, giving address 0 of each row.
+        '''
+        while self.step():
+            if self.max_steps is not None and self.steps >= self.max_steps:
+                break
+        return self.memory[:, 0]
+
+    def step(self):
+        '''
+        Run one instruction on every running row, giving False once none are.
+        '''
+        rows = numpy.flatnonzero(self.status == RUNNING)
+        if len(rows) == 0:
+            return False
+        self.steps += 1
+        rows, ip, _ = self.addresses(rows, self.ip[rows])
+        raw = self.memory[rows, ip]
+        bad = ~numpy.isin(raw, self.valid)
+        self.fault(rows[bad])
+        rows = rows[~bad]
+        ip = ip[~bad]
+        raw = raw[~bad]
+        op = raw % 100
+        for code in numpy.unique(op):
+            selected = op == code
+            self.execute(int(code), rows[selected], ip[selected], raw[selected])
+        return True
+
+    def fault(self, rows):
+        self.status[rows] = FAULTED
+
+    def addresses(self, rows, addresses):
+        '''
+        Split rows into those whose addresses are in memory and those whose
+        aren't, faulting the latter. Gives (rows, addresses, kept).
+        '''
+        kept = (addresses >= 0) & (addresses < self.length)
+        self.fault(rows[~kept])
+        return rows[kept], addresses[kept], kept
+
+    def parameter(self, rows, ip, raw, position):
+        '''
+        Fetch one parameter for each row, giving (rows, ip, raw, value, kept)
+        for the rows whose parameter was in memory. kept marks those rows
+        among the ones given.
+        '''
+        rows, addresses, kept = self.addresses(rows, ip + position + 1)
+        value = self.memory[rows, addresses]
+        position_mode = raw[kept] // 10 ** (position + 2) % 10 == 0
+        rows, pointed, pointed_kept = self.addresses(rows, numpy.where(position_mode, value, 0))
+        kept[kept] = pointed_kept
+        value = numpy.where(position_mode[pointed_kept], self.memory[rows, pointed], value[pointed_kept])
+        return rows, ip[kept], raw[kept], value, kept
+
+    def parameters(self, rows, ip, raw, count):
+        '''
+        Fetch count parameters for each row, giving (rows, ip, raw, values)
+        for the rows whose parameters were all in memory.
+        '''
+        values = list()
+        for position in range(count):
+            rows, ip, raw, value, kept = self.parameter(rows, ip, raw, position)
+            values = [previous[kept] for previous in values]
+            values.append(value)
+        return rows, ip, raw, values
+
+    def destination(self, rows, ip, values, offset):
+        '''
+        The address each row writes to, read from ip + offset.
+        '''
+        rows, addresses, kept = self.addresses(rows, ip + offset)
+        ip = ip[kept]
+        values = [value[kept] for value in values]
+        rows, destinations, kept = self.addresses(rows, self.memory[rows, addresses])
+        return rows, ip[kept], [value[kept] for value in values], destinations
+
+    def execute(self, op, rows, ip, raw):
+        memory = self.memory
+        if op == 99:
+            self.status[rows] = HALTED
+            return
+        if op == 3:
+            rows, ip, _, destinations = self.destination(rows, ip, [], 1)
+            available = self.input_index[rows] < self.inputs.shape[1]
+            self.fault(rows[~available])
+            rows = rows[available]
+            destinations = destinations[available]
+            memory[rows, destinations] = self.inputs[rows, self.input_index[rows]]
+            self.input_index[rows] += 1
+            self.ip[rows] = ip[available] + 2
+            return
+        count = 1 if op in (4, 5, 6) else 2
+        rows, ip, raw, values = self.parameters(rows, ip, raw, count)
+        if op == 4:
+            self.output_log.append((rows, values[0]))
+            self.ip[rows] = ip + 2
+        elif op == 5 or op == 6:
+            jump = values[0] != 0 if op == 5 else values[0] == 0
+            self.ip[rows[~jump]] = ip[~jump] + 3
+            # Like Program, only rows which jump read where to.
+            rows, _, _, target, _ = self.parameter(rows[jump], ip[jump], raw[jump], 1)
+            self.ip[rows] = target
+        else:
+            rows, ip, (first, second), destinations = self.destination(rows, ip, values, 3)
+            if op == 1:
+                result = first + second
+            elif op == 2:
+                result = first * second
+            elif op == 7:
+                result = (first < second).astype(numpy.int64)
+            else:
+                result = (first == second).astype(numpy.int64)
+            memory[rows, destinations] = result
+            self.ip[rows] = ip + 4
+
+    def outputs(self):
+        '''
+        Each row's outputs, as a list of lists.
+        '''
+        outputs = [list() for _ in range(len(self.memory))]
+        for rows, values in self.output_log:
+            for row, value in zip(rows.tolist(), values.tolist()):
+                outputs[row].append(value)
+        return outputs
+
+def run_grid(image, nouns, verbs, max_steps=None, chunk_size=1 << 14):
+    '''
+    run_program for every noun and verb, giving (results, halted): two
+    (len(nouns), len(verbs)) arrays of address 0 and of whether that run
+    halted. Runs are batched chunk_size at a time to bound the memory used.
+    '''
+    image = numpy.asarray(image, dtype=numpy.int64)
+    nouns = numpy.asarray(nouns, dtype=numpy.int64)
+    verbs = numpy.asarray(verbs, dtype=numpy.int64)
+    all_nouns = numpy.repeat(nouns, len(verbs))
+    all_verbs = numpy.tile(verbs, len(nouns))
+    results = numpy.zeros(len(all_nouns), dtype=numpy.int64)
+    halted = numpy.zeros(len(all_nouns), dtype=bool)
+    for start in range(0, len(all_nouns), chunk_size):
+        end = min(start + chunk_size, len(all_nouns))
+        memory = numpy.tile(image, (end - start, 1))
+        memory[:, 1] = all_nouns[start:end]
+        memory[:, 2] = all_verbs[start:end]
+        program = BatchProgram(memory, max_steps=max_steps)
+        results[start:end] = program.run()
+        halted[start:end] = program.status == HALTED
+    shape = (len(nouns), len(verbs))
+    return results.reshape(shape), halted.reshape(shape)
+
+def search_grid(image, target, nouns=range(100), verbs=range(100)):
+    '''
+    The first (noun, verb) whose run halts with target at address 0, or None.
+    '''
+    nouns = list(nouns)
+    verbs = list(verbs)
+    results, halted = run_grid(image, nouns, verbs)
+    found = numpy.argwhere(halted & (results == target))
+    if len(found) == 0:
+        return None
+    noun, verb = found[0]
+    return nouns[noun], verbs[verb]
+
+def do_test():
+    if numpy is None:
+        print("Skipped, numpy isn't installed")
+        return
+    for opcodes, noun, verb in [
+            ([1, 0, 0, 0, 99], 0, 0),
+            ([2, 3, 0, 3, 99], 3, 0),
+            ([2,4,4,5,99,0], 4, 4),
+            ([1,1,1,4,99,5,6,0,99], 1, 1)]:
+        results, halted = run_grid(opcodes, [noun], [verb])
+        assert halted[0, 0] and results[0, 0] == run_program(opcodes, noun, verb)
+    # Rows that jump apart, with input and output, from Day 5.
+    compare = [3,9,8,9,10,9,4,9,99,-1,8]
+    program = BatchProgram([compare] * 3, [[7], [8], [9]])
+    program.run()
+    assert program.outputs() == [[0], [1], [0]]
+    larger = [3,21,1008,21,8,20,1005,20,22,107,8,21,20,1006,20,31,
+              1106,0,36,98,0,0,1002,21,125,20,4,20,1105,1,46,104,
+              999,1105,1,46,1101,1000,1,20,4,20,1105,1,46,98,99]
+    program = BatchProgram([larger] * 3, [[7], [8], [9]])
+    program.run()
+    assert program.outputs() == [[999], [1000], [1001]]
+    assert (program.status == HALTED).all()
+    # Rows with a bad address or without input fault alone.
+    program = BatchProgram([[1, 0, 0, 0, 99], [1, 0, 50, 0, 99], [3, 0, 99, 0, 0]])
+    program.run()
+    assert program.status.tolist() == [HALTED, FAULTED, FAULTED]
+    assert program.memory[0, 0] == 2
+    # A jump not taken doesn't read its target, here out of memory.
+    skipped = [6,7,100,104,5,99,0,1]
+    program = BatchProgram([skipped])
+    program.run()
+    assert program.status.tolist() == [HALTED] and program.outputs() == [[5]]
+    program = BatchProgram([[1105, 1, 0], [1105, 1, -5]], max_steps=10)
+    program.run()
+    assert program.status.tolist() == [RUNNING, FAULTED] and program.steps == 10
+    # Day 2.
+    image = get_opcodes("Input/2.txt")
+    results, halted = run_grid(image, range(100), range(100), chunk_size=3000)
+    for noun, verb in [(12, 2), (0, 0), (99, 99), (57, 41)]:
+        try:
+            expected = run_program(image, noun, verb)
+        except IndexError:
+            assert not halted[noun, verb]
+        else:
+            assert halted[noun, verb] and results[noun, verb] == expected
+    noun, verb = search_grid(image, 19690720)
+    assert run_program(image, noun, verb) == 19690720
+    print("Pass")
+
+if __name__ == "__main__":
+    do_test()
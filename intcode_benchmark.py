@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# Benchmarks for the Intcode computer in intcode.py.
+#
+# Measures instructions per second for each engine on Input/2.txt and on
+# synthetic programs, runs per second for noun/verb sweeps and the peak memory
+# of each benchmark. Results can be saved as JSON and later runs compared
+# against them, failing if anything has got slower or bigger than the saved
+# baseline allows.
+#
+#   python intcode_benchmark.py --save baseline.json
+#   python intcode_benchmark.py --baseline baseline.json --tolerance 0.2
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from array import array
+
+from intcode import (
+    IMAGE_TYPECODE, CompiledProgram, Program, get_opcodes, run_compiled, run_kernel, run_program, run_shared
+)
+from intcode_codegen import BlockCache, run_generated
+
+def straight_line_program(count):
+    '''
+    count add instructions, each adding 1 to a counter, then a halt.
+    '''
+    counter = 4 * count + 1
+    return [1, counter, counter + 1, counter] * count + [99, 0, 1]
+
+def loop_program(count):
+    '''
+    Counts down from count with a jump, running 2 * count + 1 instructions.
+    '''
+    return [1001, 8, -1, 8, 1005, 8, 0, 99, count]
+
+def measure(function):
+    '''
+    Call function twice, giving (its result, seconds taken, peak bytes
+    allocated). Tracing allocations slows everything down, so the
+    peak comes from a second, untimed call.
+    '''
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak
+
+def instructions_per_second(program_class, opcodes, repeat):
+    '''
+    Run a fresh copy of opcodes repeat times, including the time to set up
+    each program.
+    '''
+    def run():
+        executed = 0
+        for _ in range(repeat):
+            program = program_class(opcodes[:])
+            program.run()
+            executed += program.executed
+        return executed
+    executed, seconds, peak = measure(run)
+    return {"instructions_per_second": executed / seconds, "peak_bytes": peak}
+
+def kernel_instructions_per_second(opcodes, repeat):
+    '''
+    instructions_per_second for run_kernel, which doesn't count instructions,
+    so the count comes from a Program run first.
+    '''
+    program = Program(opcodes[:])
+    program.run()
+    def run():
+        for _ in range(repeat):
+            run_kernel(opcodes[:])
+        return program.executed * repeat
+    executed, seconds, peak = measure(run)
+    return {"instructions_per_second": executed / seconds, "peak_bytes": peak}
+
+def runs_per_second(sweep, size):
+    def run():
+        for noun in range(size):
+            for verb in range(size):
+                sweep(noun, verb)
+        return size * size
+    runs, seconds, peak = measure(run)
+    return {"runs_per_second": runs / seconds, "peak_bytes": peak}
+
+def run_benchmarks(path, size, sweep_size):
+    day_2 = get_opcodes(path)
+    results = dict()
+    for name, opcodes, repeat in [
+            ("day_2", day_2, 1000),
+            ("straight_line", straight_line_program(size), 1),
+            ("loop", loop_program(size), 1)]:
+        results["Program/" + name] = instructions_per_second(Program, opcodes, repeat)
+        if name != "loop":
+            results["CompiledProgram/" + name] = instructions_per_second(CompiledProgram, opcodes, repeat)
+            results["run_kernel/" + name] = kernel_instructions_per_second(opcodes, repeat)
+    image = array(IMAGE_TYPECODE, day_2)
+    compiled = CompiledProgram(day_2)
+    # Kept in memory, as a block cache on disk would only speed up the first run.
+    blocks = BlockCache(day_2, None)
+    for name, sweep in [
+            ("run_program", lambda noun, verb: run_program(day_2, noun, verb)),
+            ("run_shared", lambda noun, verb: run_shared(image, noun, verb)),
+            ("run_compiled", lambda noun, verb: run_compiled(compiled, noun, verb)),
+            ("run_generated", lambda noun, verb: run_generated(blocks, day_2, noun, verb))]:
+        results["sweep/" + name] = runs_per_second(sweep, sweep_size)
+    return results
+
+def regressions(results, baseline, tolerance):
+    '''
+    Describe every result more than tolerance (a fraction) slower or bigger
+    than the baseline.
+    '''
+    found = list()
+    for name, metrics in sorted(baseline.items()):
+        for metric, expected in sorted(metrics.items()):
+            actual = results.get(name, {}).get(metric)
+            if actual is None or expected is None:
+                continue
+            if metric == "peak_bytes":
+                worse = actual > expected * (1 + tolerance)
+            else:
+                worse = actual < expected * (1 - tolerance)
+            if worse:
+                found.append(name + " " + metric + ": " + str(actual) + " against " + str(expected))
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Intcode computer.")
+    parser.add_argument("--input", default="Input/2.txt", help="Day 2 program to benchmark")
+    parser.add_argument("--size", type=int, default=200000, help="instructions in the synthetic programs")
+    parser.add_argument("--sweep", type=int, default=100, help="nouns and verbs in each sweep")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved with --save")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed fraction worse than the baseline")
+    args = parser.parse_args()
+    results = run_benchmarks(args.input, args.size, args.sweep)
+    for name, metrics in sorted(results.items()):
+        print(name + " " + ", ".join(
+            metric + "=" + str(int(value)) for metric, value in sorted(metrics.items())
+        ))
+    if args.save:
+        with open(args.save, "w") as out_file:
+            json.dump(results, out_file, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as in_file:
+            baseline = json.load(in_file)
+        found = regressions(results, baseline, args.tolerance)
+        for regression in found:
+            print("Regression: " + regression)
+        if found:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# Translates Intcode into Python.
+#
+# A basic block is a run of instructions ending at a jump or a halt. Each one
+# is translated into the source of a Python function, compiled with compile()
+# and run in place of interpreting its instructions one at a time. A block
+# only depends on its instruction values (opcode and modes): parameters are
+# read from memory as it runs. So patching a noun and verb, or a program
+# writing to its own parameters, needs no translation.
+#
+# Each block starts by checking its instruction values are still the ones it
+# was translated from, and is translated again if not. A block which writes
+# over one of its own later instruction values stops after the write, so the
+# rest is checked and translated again too.
+#
+# Translated blocks are saved under .cache/intcode at the end of a run which
+# translated any, keyed by a hash of the program and the Python version, so
+# later runs of the same program don't translate anything either.
+#
+# Run this file to test it.
+
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+
+from intcode import DECODE_TABLE, Program, get_opcodes, make_reader, make_writer, run_program
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "intcode")
+
+# Change this whenever translate changes what it generates.
+GENERATOR_VERSION = 2
+
+# Blocks longer than this are split, to keep each function a sensible size.
+MAX_BLOCK = 256
+
+# What a block gives when its instructions have changed since it was
+# translated. It can't be an address, unlike anything a jump can give.
+INVALID = object()
+
+def parameter(index, mode):
+    if mode:
+        return "m[" + str(index) + "]"
+    return "m[m[" + str(index) + "]]"
+
+def translate(memory, start):
+    '''
+    Translate the block starting at start into the source of a function
+    block(m, read, write), giving (source, number of instructions). The
+    function gives the index of the next instruction, None after a halt, or
+    INVALID if its instructions have changed.
+    '''
+    instructions = list()
+    index = start
+    while len(instructions) < MAX_BLOCK and 0 <= index < len(memory):
+        raw = memory[index]
+        if raw not in DECODE_TABLE:
+            break
+        op, modes = DECODE_TABLE[raw]
+        instructions.append((index, raw, op, modes))
+        index += len(modes) + 1
+        if op in (5, 6, 99):
+            break
+    if not 0 <= start < len(memory):
+        raise RuntimeError("Jump to " + str(start) + ", outside memory")
+    if not instructions:
+        raise RuntimeError("Unknown instruction " + str(memory[start]) + " at index " + str(start))
+    end = index
+    checks = " or ".join("m[" + str(index) + "] != " + str(raw) for index, raw, _, _ in instructions)
+    lines = [
+        "def block(m, read, write):",
+        "    if " + checks + ":",
+        "        return INVALID",
+    ]
+    for position, (index, raw, op, modes) in enumerate(instructions):
+        after = index + len(modes) + 1
+        if op in (1, 2, 7, 8):
+            first = parameter(index + 1, modes[0])
+            second = parameter(index + 2, modes[1])
+            lines.append("    d = m[" + str(index + 3) + "]")
+            if op == 1:
+                lines.append("    m[d] = " + first + " + " + second)
+            elif op == 2:
+                lines.append("    m[d] = " + first + " * " + second)
+            elif op == 7:
+                lines.append("    m[d] = 1 if " + first + " < " + second + " else 0")
+            else:
+                lines.append("    m[d] = 1 if " + first + " == " + second + " else 0")
+        elif op == 3:
+            lines.append("    d = m[" + str(index + 1) + "]")
+            lines.append("    m[d] = read()")
+        elif op == 4:
+            lines.append("    write(" + parameter(index + 1, modes[0]) + ")")
+        elif op == 5:
+            lines.append("    if " + parameter(index + 1, modes[0]) + " != 0:")
+            lines.append("        return " + parameter(index + 2, modes[1]))
+        elif op == 6:
+            lines.append("    if " + parameter(index + 1, modes[0]) + " == 0:")
+            lines.append("        return " + parameter(index + 2, modes[1]))
+        elif op == 99:
+            lines.append("    return None")
+        later = [str(instruction[0]) for instruction in instructions[position + 1:]]
+        if op in (1, 2, 3, 7, 8) and later:
+            # Stop if that overwrote an instruction still to come.
+            lines.append("    if d in {" + ", ".join(later) + "}:")
+            lines.append("        return " + str(after))
+    if instructions[-1][2] != 99:
+        lines.append("    return " + str(end))
+    return "\n".join(lines) + "\n", len(instructions)
+
+def image_key(image):
+    '''
+    A name for a program's cached blocks, which also changes with the Python
+    version as compiled code only works with the version that compiled it.
+    '''
+    digest = hashlib.sha256(",".join(str(value) for value in image).encode())
+    digest.update((sys.implementation.cache_tag + "-" + str(GENERATOR_VERSION)).encode())
+    return digest.hexdigest()
+
+class BlockCache:
+    '''
+    The translated blocks of one program, {start: (function, instructions)},
+    loaded from and saved to cache_dir. Pass None to keep them in memory
+    only.
+    '''
+
+    def __init__(self, image, cache_dir=CACHE_DIR):
+        self.blocks = dict()
+        # {start: (compiled code, instructions)}, as saved.
+        self.codes = dict()
+        self.changed = False
+        self.path = None
+        if cache_dir is not None:
+            self.path = os.path.join(cache_dir, image_key(image) + ".marshal")
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "rb") as in_file:
+                codes = marshal.load(in_file)
+        except (OSError, EOFError, ValueError, TypeError):
+            # Missing or unreadable, so translate everything again.
+            return
+        for start, (code, count) in codes.items():
+            self.add(start, code, count)
+
+    def save(self):
+        '''
+        Write the blocks to disk if any have been translated since loading.
+        '''
+        if self.path is None or not self.changed:
+            return
+        directory = os.path.dirname(self.path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        # Write and rename, so a reader never sees half a file.
+        handle, temporary = tempfile.mkstemp(dir=directory)
+        with os.fdopen(handle, "wb") as out_file:
+            marshal.dump(self.codes, out_file)
+        os.replace(temporary, self.path)
+        self.changed = False
+
+    def add(self, start, code, count):
+        namespace = {"INVALID": INVALID}
+        exec(code, namespace)
+        self.blocks[start] = (namespace["block"], count)
+        self.codes[start] = (code, count)
+
+    def translate(self, memory, start):
+        source, count = translate(memory, start)
+        code = compile(source, "<intcode block " + str(start) + ">", "exec")
+        self.add(start, code, count)
+        self.changed = True
+        return self.blocks[start]
+
+class GeneratedProgram:
+    '''
+    Same interface as Program, but runs translated blocks from blocks, a
+    BlockCache, instead of interpreting. Without one, blocks are translated
+    for this run only. The cache is saved when a run which translated
+    anything finishes. executed counts whole blocks, so a block which stops
+    early after overwriting itself is counted in full.
+    '''
+
+    def __init__(self, opcodes, inputs=None, outputs=None, blocks=None):
+        self.opcodes = opcodes
+        self.read = make_reader(inputs)
+        if outputs is None:
+            outputs = list()
+        self.outputs = outputs
+        self.write = make_writer(outputs)
+        self.executed = 0
+        if blocks is None:
+            blocks = BlockCache(opcodes, None)
+        self.block_cache = blocks
+
+    def run(self):
+        memory = self.opcodes
+        read = self.read
+        write = self.write
+        cache = self.block_cache
+        blocks = cache.blocks
+        executed = 0
+        index = 0
+        while index is not None:
+            block = blocks.get(index)
+            if block is None:
+                block = cache.translate(memory, index)
+            function, count = block
+            next_index = function(memory, read, write)
+            if next_index is INVALID:
+                cache.translate(memory, index)
+                continue
+            executed += count
+            index = next_index
+        self.executed = executed
+        cache.save()
+        return memory[0]
+
+def run_generated(blocks, image, noun, verb):
+    '''
+    run_program with the blocks translated from image, which is left alone.
+    '''
+    opcodes = list(image)
+    opcodes[1] = noun
+    opcodes[2] = verb
+    return GeneratedProgram(opcodes, blocks=blocks).run()
+
+def do_test():
+    for opcodes, noun, verb in [
+            ([1, 0, 0, 0, 99], 0, 0),
+            ([2, 3, 0, 3, 99], 3, 0),
+            ([2,4,4,5,99,0], 4, 4),
+            ([1,1,1,4,99,5,6,0,99], 1, 1)]:
+        blocks = BlockCache(opcodes, None)
+        assert run_generated(blocks, opcodes, noun, verb) == run_program(opcodes, noun, verb)
+    # Jumps, comparisons and I/O, from Day 5.
+    for opcodes, value, expected in [
+            ([3,9,8,9,10,9,4,9,99,-1,8], 8, 1),
+            ([3,3,1107,-1,8,3,4,3,99], 9, 0),
+            ([3,12,6,12,15,1,13,14,13,4,13,99,-1,0,1,9], 0, 0),
+            ([3,21,1008,21,8,20,1005,20,22,107,8,21,20,1006,20,31,
+              1106,0,36,98,0,0,1002,21,125,20,4,20,1105,1,46,104,
+              999,1105,1,46,1101,1000,1,20,4,20,1105,1,46,98,99], 9, 1001)]:
+        program = GeneratedProgram(opcodes[:], [value])
+        program.run()
+        assert program.outputs == [expected]
+    # A loop, counted in whole blocks.
+    program = GeneratedProgram([1001, 8, -1, 8, 1005, 8, 0, 99, 100])
+    program.run()
+    assert program.executed == 201
+    # Self-modifying code: the first instruction turns the third from an add
+    # into a multiply, and the block is cut short and translated again.
+    opcodes = [1101, 1, 1, 8, 1, 0, 0, 0, 1, 13, 13, 0, 99, 5]
+    assert GeneratedProgram(opcodes[:]).run() == Program(opcodes[:]).run() == 25
+    blocks = BlockCache(opcodes, None)
+    assert GeneratedProgram(opcodes[:], blocks=blocks).run() == 25
+    assert GeneratedProgram(opcodes[:], blocks=blocks).run() == 25
+    # Jumps to addresses that aren't in memory fail like Program.
+    for opcodes in ([1105,1,-1], [1105,1,50]):
+        try:
+            GeneratedProgram(opcodes).run()
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("Bad jump not reported")
+    # Day 2, through a cache on disk.
+    image = get_opcodes("Input/2.txt")
+    cache_dir = tempfile.mkdtemp()
+    try:
+        blocks = BlockCache(image, cache_dir)
+        assert run_generated(blocks, image, 12, 2) == 3760627
+        assert not blocks.changed
+        loaded = BlockCache(image, cache_dir)
+        assert sorted(loaded.blocks) == sorted(blocks.blocks)
+        assert run_generated(loaded, image, 71, 95) == run_program(image, 71, 95)
+        assert not loaded.changed
+        with open(loaded.path, "wb") as out_file:
+            out_file.write(b"corrupt")
+        assert BlockCache(image, cache_dir).blocks == dict()
+    finally:
+        for name in os.listdir(cache_dir):
+            os.remove(os.path.join(cache_dir, name))
+        os.rmdir(cache_dir)
+    print("Pass")
+
+if __name__ == "__main__":
+    do_test()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# Networks of Intcode computers, run together with asyncio.
+#
+# Each machine in a Network is an asyncio task running a Machine from
+# intcode.py a slice of instructions at a time. A machine's outputs are sent
+# to every machine it is connected to, and when it needs input it waits for
+# something to arrive in its inbox, letting the others run meanwhile. So
+# chains, feedback loops and fan-out all interleave in one process.
+#
+# Inboxes are bounded, so a machine which gets ahead of its consumer waits for
+# it to catch up. A machine stops when it halts, or when it needs input and
+# everything connected to it has stopped. If every machine left is waiting,
+# for input or for room in an inbox, nothing can ever happen again, so they
+# are all stopped too.
+#
+# Run this file to test it.
+
+import asyncio
+import time
+from array import array
+
+from intcode import IMAGE_TYPECODE, Machine, State
+
+# Put in an inbox whose consumer is waiting once all of its producers have
+# stopped.
+CLOSED = object()
+
+GET = "get"
+PUT = "put"
+
+class Channel:
+    '''
+    A machine's inbox. Values sent after the machine has stopped are kept in
+    undelivered instead.
+    '''
+
+    def __init__(self, maxsize):
+        self.queue = asyncio.Queue(maxsize)
+        self.producers = 0
+        self.stopped = False
+        self.undelivered = list()
+
+    def drain(self):
+        '''
+        Move anything left in the queue to undelivered, which also frees any
+        producer waiting for room.
+        '''
+        while not self.queue.empty():
+            value = self.queue.get_nowait()
+            if value is not CLOSED:
+                self.undelivered.append(value)
+
+class Node:
+
+    def __init__(self, name, machine, maxsize):
+        self.name = name
+        self.machine = machine
+        self.inbox = Channel(maxsize)
+        self.outboxes = list()
+        self.seconds = 0.0
+        self.task = None
+        # (GET or PUT, channel) while waiting on a channel.
+        self.blocked = None
+
+class Network:
+    '''
+    Machines connected by bounded queues. maxsize is the size of each inbox
+    and steps how many instructions a machine runs before letting others
+    have a turn.
+    '''
+
+    def __init__(self, maxsize=64, steps=1000):
+        self.maxsize = maxsize
+        self.steps = steps
+        self.nodes = dict()
+        self.seconds = 0.0
+        self.deadlocked = False
+
+    def add(self, name, program, inputs=()):
+        '''
+        Add a machine running program, which can be a list, an array image
+        shared with other machines, or a State. inputs are given to it before
+        anything it's connected to.
+        '''
+        if name in self.nodes:
+            raise ValueError("Duplicate machine " + str(name))
+        state = program if isinstance(program, State) else State(program, inputs)
+        node = Node(name, Machine(state), self.maxsize)
+        self.nodes[name] = node
+        return node.machine
+
+    def connect(self, source, destination):
+        '''
+        Send everything source outputs to destination. A machine connected to
+        several others sends each of them every value.
+        '''
+        self.nodes[source].outboxes.append(self.nodes[destination].inbox)
+        self.nodes[destination].inbox.producers += 1
+
+    def chain(self, names, loop=False):
+        '''
+        Connect each machine to the next, and the last back to the first if
+        loop is true.
+        '''
+        names = list(names)
+        for source, destination in zip(names, names[1:]):
+            self.connect(source, destination)
+        if loop and len(names) > 1:
+            self.connect(names[-1], names[0])
+
+    async def run_node(self, node):
+        machine = node.machine
+        state = machine.state
+        try:
+            while True:
+                start = time.perf_counter()
+                status = machine.run(self.steps)
+                node.seconds += time.perf_counter() - start
+                if node.outboxes and state.outputs:
+                    values = state.outputs[:]
+                    del state.outputs[:]
+                    for position, value in enumerate(values):
+                        try:
+                            for outbox in node.outboxes:
+                                await self.put(node, outbox, value)
+                        except asyncio.CancelledError:
+                            # Keep what wasn't sent to every machine.
+                            state.outputs[:0] = values[position:]
+                            raise
+                if status == State.HALTED:
+                    return
+                if status == State.WAITING:
+                    if node.inbox.producers == 0 and node.inbox.queue.empty():
+                        return
+                    value = await self.get(node)
+                    if value is CLOSED:
+                        return
+                    state.inputs.append(value)
+                else:
+                    await asyncio.sleep(0)
+        except asyncio.CancelledError:
+            if not self.deadlocked:
+                raise
+        finally:
+            self.stop_node(node)
+
+    async def put(self, node, channel, value):
+        if channel.stopped:
+            channel.undelivered.append(value)
+        elif not channel.queue.full():
+            channel.queue.put_nowait(value)
+        else:
+            node.blocked = (PUT, channel)
+            self.check_deadlock()
+            try:
+                await channel.queue.put(value)
+            finally:
+                node.blocked = None
+
+    async def get(self, node):
+        channel = node.inbox
+        if not channel.queue.empty():
+            return channel.queue.get_nowait()
+        node.blocked = (GET, channel)
+        self.check_deadlock()
+        try:
+            return await channel.queue.get()
+        finally:
+            node.blocked = None
+
+    def check_deadlock(self):
+        '''
+        Stop every machine if each one still running is waiting on a channel
+        which can't satisfy it. A machine which has been woken but hasn't run
+        yet is still marked as blocked, so the channels are checked too.
+        '''
+        running = [node for node in self.nodes.values() if not node.task.done()]
+        for node in running:
+            if node.blocked is None:
+                return
+            waiting_for, channel = node.blocked
+            if waiting_for == GET and not channel.queue.empty():
+                return
+            if waiting_for == PUT and not channel.queue.full():
+                return
+        self.deadlocked = True
+        for node in running:
+            node.task.cancel()
+
+    def stop_node(self, node):
+        node.inbox.stopped = True
+        node.inbox.drain()
+        for outbox in node.outboxes:
+            outbox.producers -= 1
+            # A consumer which isn't waiting finds its producers gone when it
+            # next needs input.
+            if outbox.producers == 0 and not outbox.stopped and outbox.queue.empty():
+                outbox.queue.put_nowait(CLOSED)
+
+    async def run_async(self):
+        start = time.perf_counter()
+        for node in self.nodes.values():
+            node.task = asyncio.ensure_future(self.run_node(node))
+        await asyncio.gather(*[node.task for node in self.nodes.values()])
+        for node in self.nodes.values():
+            node.inbox.drain()
+        self.seconds = time.perf_counter() - start
+        return self.statuses()
+
+    def run(self):
+        '''
+        Run every machine until they have all stopped, giving their statuses.
+        '''
+        return asyncio.run(self.run_async())
+
+    def statuses(self):
+        return dict((name, node.machine.state.status) for name, node in self.nodes.items())
+
+    def outputs(self, name):
+        '''
+        What a machine output which wasn't sent anywhere, because it isn't
+        connected to anything.
+        '''
+        return self.nodes[name].machine.state.outputs
+
+    def undelivered(self, name):
+        '''
+        Values sent to a machine which it never read.
+        '''
+        return self.nodes[name].inbox.undelivered
+
+    def throughput(self):
+        '''
+        {name: (instructions, seconds, instructions per second)} for each
+        machine, counting only the time it spent running instructions.
+        '''
+        results = dict()
+        for name, node in self.nodes.items():
+            executed = node.machine.state.executed
+            rate = executed / node.seconds if node.seconds else 0.0
+            results[name] = (executed, node.seconds, rate)
+        return results
+
+def do_test():
+    # Day 7's amplifiers, in a chain and in a feedback loop.
+    amplifier = [3,15,3,16,1002,16,10,16,1,16,15,15,4,15,99,0,0]
+    network = Network()
+    for name, phase in zip("ABCDE", (4, 3, 2, 1, 0)):
+        network.add(name, amplifier, [phase] + ([0] if name == "A" else []))
+    network.chain("ABCDE")
+    assert network.run() == dict((name, State.HALTED) for name in "ABCDE")
+    assert network.outputs("E") == [43210]
+    amplifier = [3,26,1001,26,-4,26,3,27,1002,27,2,27,1,27,26,27,4,27,1001,28,-1,28,1005,28,6,99,0,0,5]
+    image = array(IMAGE_TYPECODE, amplifier)
+    for maxsize in (1, 64):
+        network = Network(maxsize=maxsize, steps=5)
+        for name, phase in zip("ABCDE", (9, 8, 7, 6, 5)):
+            network.add(name, image, [phase] + ([0] if name == "A" else []))
+        network.chain("ABCDE", loop=True)
+        network.run()
+        assert network.undelivered("A") == [139629729]
+        assert not network.deadlocked
+    assert list(image) == amplifier
+    # Fan out to machines which wait for more input once their source halts.
+    double = [3,11,1002,11,2,12,4,12,1105,1,0,0,0]
+    network = Network()
+    network.add("source", [104,7,104,8,99])
+    for name in ("left", "right"):
+        network.add(name, double)
+        network.connect("source", name)
+    statuses = network.run()
+    assert statuses == {"source": State.HALTED, "left": State.WAITING, "right": State.WAITING}
+    assert network.outputs("left") == network.outputs("right") == [14, 16]
+    # A loop with nothing to start it stops rather than waiting forever.
+    network = Network()
+    network.add("a", double)
+    network.add("b", double)
+    network.chain("ab", loop=True)
+    assert network.run() == {"a": State.WAITING, "b": State.WAITING}
+    assert network.deadlocked
+    # So does a loop of machines each waiting for room in the other's inbox,
+    # keeping what they couldn't send.
+    network = Network(maxsize=1)
+    network.add("a", [104,1,1105,1,0])
+    network.add("b", [104,2,1105,1,0])
+    network.chain("ab", loop=True)
+    network.run()
+    assert network.deadlocked
+    assert network.outputs("a")[0] == 1 and network.outputs("b")[0] == 2
+    assert network.undelivered("a") == [2] and network.undelivered("b") == [1]
+    # A long chain, with a fast producer held back by a small inbox.
+    increment = [3,9,1001,9,1,9,4,9,99,0]
+    network = Network(maxsize=1)
+    names = list(range(50))
+    for name in names:
+        network.add(name, increment, [0] if name == 0 else [])
+    network.chain(names)
+    network.run()
+    assert network.outputs(49) == [50]
+    network = Network(maxsize=2, steps=1)
+    network.add("producer", [104,1] * 20 + [99])
+    network.add("consumer", double)
+    network.connect("producer", "consumer")
+    network.run()
+    assert network.outputs("consumer") == [2] * 20
+    executed, seconds, rate = network.throughput()["producer"]
+    assert executed == 21 and seconds > 0 and rate > 0
+    print("Pass")
+
+if __name__ == "__main__":
+    do_test()
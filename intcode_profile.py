@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# Profiling and tracing for the Intcode computer in intcode.py.
+#
+# ProfiledProgram runs a program like Program, counting how often each opcode
+# runs and how long it takes, how often each instruction is reached, and how
+# often each address is read and written. It can also write every instruction
+# to a trace, which replay runs again to check a program still takes the same
+# path. Program itself is untouched, so none of this costs anything unless a
+# ProfiledProgram is used.
+#
+#   python intcode_profile.py Input/2.txt --noun 12 --verb 2
+#   python intcode_profile.py Input/2.txt --noun 12 --verb 2 --trace run.trace
+#   python intcode_profile.py Input/2.txt --replay run.trace
+#
+# Without a program it runs its tests.
+#
+# A trace is TRACE_MAGIC followed by one TRACE_RECORD per instruction: the
+# instruction's address, its raw value, and the value read or written for
+# input and output instructions (0 otherwise). A value too big for the record
+# is marked by TRACE_WIDE in the raw value, and the record's value is then
+# the number of bytes of little-endian two's complement that follow it.
+
+import argparse
+import io
+import os
+import struct
+import tempfile
+import time
+from collections import Counter
+
+from intcode import DECODE_TABLE, Program, get_opcodes
+
+OPCODE_NAMES = {
+    1: "add",
+    2: "multiply",
+    3: "input",
+    4: "output",
+    5: "jump_if_true",
+    6: "jump_if_false",
+    7: "less_than",
+    8: "equals",
+    99: "halt",
+}
+
+TRACE_MAGIC = b"ICTRACE1"
+TRACE_RECORD = struct.Struct("<IHq")
+TRACE_WIDE = 0x8000
+# The values which fit in a record.
+TRACE_MIN = -(1 << 63)
+TRACE_MAX = (1 << 63) - 1
+
+class Profile:
+    '''
+    What a profiled program did. counts and seconds are by opcode, ips by
+    instruction address, reads and writes by memory address.
+    '''
+
+    def __init__(self):
+        self.counts = Counter()
+        self.seconds = Counter()
+        self.ips = Counter()
+        self.reads = Counter()
+        self.writes = Counter()
+
+    def report(self, top=10):
+        '''
+        A summary as a list of lines, showing the top addresses of each kind.
+        '''
+        lines = ["opcode         count    seconds  ns/op"]
+        for op, count in self.counts.most_common():
+            seconds = self.seconds[op]
+            lines.append(
+                "%-12s %7d %10.6f %6d" % (OPCODE_NAMES.get(op, str(op)), count, seconds, seconds * 1e9 / count)
+            )
+        for title, counter in (("Hot instructions", self.ips), ("Reads", self.reads), ("Writes", self.writes)):
+            if counter:
+                lines.append(title + ": " + ", ".join(
+                    str(address) + " x" + str(count) for address, count in counter.most_common(top)
+                ))
+        return lines
+
+class CountingMemory:
+    '''
+    Wraps a program's memory, counting reads and writes of each address.
+    '''
+
+    def __init__(self, memory, reads, writes):
+        self.memory = memory
+        self.reads = reads
+        self.writes = writes
+
+    def __len__(self):
+        return len(self.memory)
+
+    def __getitem__(self, address):
+        self.reads[address] += 1
+        return self.memory[address]
+
+    def __setitem__(self, address, value):
+        self.writes[address] += 1
+        self.memory[address] = value
+
+class ProfiledProgram(Program):
+    '''
+    A Program which records what it does in profile, a Profile, and if trace
+    is a binary file also writes each instruction to it. Fetching an
+    instruction isn't counted as reading memory, but reading its parameters
+    is.
+    '''
+
+    # Bytes of trace to collect before writing them.
+    TRACE_BUFFER = 1 << 16
+
+    def __init__(self, opcodes, inputs=None, outputs=None, max_instructions=None, profile=None, trace=None):
+        Program.__init__(self, opcodes, inputs, outputs, max_instructions)
+        if profile is None:
+            profile = Profile()
+        self.profile = profile
+        self.trace = trace
+        self.memory = opcodes
+        self.opcodes = CountingMemory(opcodes, profile.reads, profile.writes)
+        # The value the last input or output instruction moved, for the trace.
+        self.value = 0
+        read = self.read
+        write = self.write
+        def traced_read():
+            self.value = read()
+            return self.value
+        def traced_write(value):
+            self.value = value
+            write(value)
+        self.read = traced_read
+        self.write = traced_write
+
+    def run(self):
+        memory = self.memory
+        opcode_table = self.opcode_table
+        budget = self.max_instructions
+        profile = self.profile
+        counts = profile.counts
+        seconds = profile.seconds
+        ips = profile.ips
+        clock = time.perf_counter
+        trace = self.trace
+        buffer = bytearray()
+        if trace is not None:
+            buffer += TRACE_MAGIC
+        pack = TRACE_RECORD.pack
+        executed = 0
+        index = 0
+        try:
+            while index is not None:
+                if budget is not None and executed >= budget:
+                    raise RuntimeError(
+                        "Instruction budget of " + str(budget) + " exhausted at index " + str(index)
+                    )
+                raw = memory[index]
+                try:
+                    op, modes = DECODE_TABLE[raw]
+                except KeyError:
+                    raise RuntimeError("Unknown instruction " + str(raw) + " at index " + str(index))
+                counts[op] += 1
+                ips[index] += 1
+                self.value = 0
+                start = clock()
+                next_index = opcode_table[op](index, modes)
+                seconds[op] += clock() - start
+                executed += 1
+                if trace is not None:
+                    value = self.value
+                    if TRACE_MIN <= value <= TRACE_MAX:
+                        buffer += pack(index, raw, value)
+                    else:
+                        data = value.to_bytes(value.bit_length() // 8 + 1, "little", signed=True)
+                        buffer += pack(index, raw | TRACE_WIDE, len(data))
+                        buffer += data
+                    if len(buffer) >= self.TRACE_BUFFER:
+                        trace.write(buffer)
+                        buffer = bytearray()
+                index = next_index
+        finally:
+            self.executed = executed
+            if trace is not None:
+                trace.write(buffer)
+        return memory[0]
+
+def read_trace(trace):
+    '''
+    Read a trace from a binary file, giving (address, raw instruction, value)
+    for each instruction.
+    '''
+    if trace.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+        raise RuntimeError("Not an Intcode trace")
+    size = TRACE_RECORD.size
+    unpack = TRACE_RECORD.unpack_from
+    data = b""
+    offset = 0
+    def more(needed):
+        # Make sure needed bytes are left after offset, reading more if not.
+        nonlocal data, offset
+        while len(data) - offset < needed:
+            chunk = trace.read(size * 4096)
+            if not chunk:
+                return False
+            data = data[offset:] + chunk
+            offset = 0
+        return True
+    while more(size):
+        index, raw, value = unpack(data, offset)
+        offset += size
+        if raw & TRACE_WIDE:
+            if not more(value):
+                raise RuntimeError("Trace is truncated")
+            raw &= ~TRACE_WIDE
+            end = offset + value
+            value = int.from_bytes(data[offset:end], "little", signed=True)
+            offset = end
+        yield index, raw, value
+    if offset < len(data):
+        raise RuntimeError("Trace is truncated")
+
+def trace_profile(trace):
+    '''
+    A Profile of the opcode counts and hot instructions in a trace, without
+    running anything.
+    '''
+    profile = Profile()
+    for index, raw, _ in read_trace(trace):
+        profile.counts[DECODE_TABLE[raw][0]] += 1
+        profile.ips[index] += 1
+    return profile
+
+class TraceChecker:
+    '''
+    A file to write a trace to which checks it matches an existing trace
+    instead.
+    '''
+
+    def __init__(self, trace):
+        self.trace = trace
+        self.offset = 0
+
+    def write(self, data):
+        expected = self.trace.read(len(data))
+        if expected != data:
+            record = max(self.offset - len(TRACE_MAGIC), 0) // TRACE_RECORD.size
+            raise RuntimeError("Replay diverged from the trace near instruction " + str(record))
+        self.offset += len(data)
+
+def replay(opcodes, path):
+    '''
+    Run a program again with the input recorded in the trace at path,
+    checking every instruction matches. Gives the ProfiledProgram.
+    '''
+    with open(path, "rb") as trace:
+        inputs = [value for _, raw, value in read_trace(trace) if raw % 100 == 3]
+        trace.seek(0)
+        checker = TraceChecker(trace)
+        program = ProfiledProgram(opcodes, inputs, trace=checker)
+        program.run()
+        if trace.read(1):
+            raise RuntimeError("Replay halted before the end of the trace")
+    return program
+
+def do_test():
+    opcodes = [3,12,1002,12,2,13,4,13,1005,12,0,99,0,0]
+    profile = Profile()
+    trace = io.BytesIO()
+    program = ProfiledProgram(opcodes[:], [2, 1, 0], profile=profile, trace=trace)
+    program.run()
+    assert program.outputs == [4, 2, 0]
+    assert program.executed == 13
+    assert profile.counts == {3: 3, 2: 3, 4: 3, 5: 3, 99: 1}
+    assert profile.ips == {0: 3, 2: 3, 6: 3, 8: 3, 11: 1}
+    assert profile.writes == {12: 3, 13: 3}
+    assert profile.reads[12] == 6 and profile.reads[13] == 3
+    assert len(profile.report()) == 9
+    # Tracing must not change what runs.
+    assert ProfiledProgram(get_opcodes("Input/2.txt")).run() == Program(get_opcodes("Input/2.txt")).run()
+    trace.seek(0)
+    records = list(read_trace(trace))
+    assert len(records) == 13
+    assert records[:3] == [(0, 3, 2), (2, 1002, 0), (6, 4, 4)]
+    trace.seek(0)
+    assert trace_profile(trace).counts == profile.counts
+    # Values too big for a record are written after it.
+    for value in (2 ** 70, -2 ** 70, 2 ** 63, -2 ** 63):
+        wide = io.BytesIO()
+        ProfiledProgram([104, value, 99], trace=wide).run()
+        wide.seek(0)
+        assert list(read_trace(wide)) == [(0, 104, value), (2, 99, 0)]
+    wide = io.BytesIO(wide.getvalue()[:-1])
+    try:
+        list(read_trace(wide))
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("Truncated trace not reported")
+    # Replaying checks the program follows the trace.
+    handle, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(handle, "wb") as out_file:
+            out_file.write(trace.getvalue())
+        assert replay(opcodes[:], path).outputs == [4, 2, 0]
+        with open(path, "wb") as out_file:
+            ProfiledProgram([3,0,4,0,99], [2 ** 70], trace=out_file).run()
+        assert replay([3,0,4,0,99], path).outputs == [2 ** 70]
+        changed = opcodes[:]
+        changed[3] = 3
+        try:
+            replay(changed, path)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("Divergent replay not reported")
+    finally:
+        os.remove(path)
+    print("Pass")
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile an Intcode program.")
+    parser.add_argument("program", nargs="?", help="the program to run (default run the tests)")
+    parser.add_argument("--noun", type=int, help="value for address 1")
+    parser.add_argument("--verb", type=int, help="value for address 2")
+    parser.add_argument("--input", type=int, action="append", default=[], help="an input value, can be repeated")
+    parser.add_argument("--trace", help="write a trace to this file")
+    parser.add_argument("--replay", help="replay a trace written with --trace")
+    parser.add_argument("--top", type=int, default=10, help="addresses to show in each list")
+    args = parser.parse_args()
+    if args.program is None:
+        do_test()
+        return
+
+    opcodes = get_opcodes(args.program)
+    if args.noun is not None:
+        opcodes[1] = args.noun
+    if args.verb is not None:
+        opcodes[2] = args.verb
+    if args.replay:
+        program = replay(opcodes, args.replay)
+        print("Replayed " + str(program.executed) + " instructions")
+    elif args.trace:
+        with open(args.trace, "wb") as trace:
+            program = ProfiledProgram(opcodes, args.input, trace=trace)
+            program.run()
+    else:
+        program = ProfiledProgram(opcodes, args.input)
+        program.run()
+    if program.outputs:
+        print("Outputs: " + ", ".join(str(value) for value in program.outputs))
+    print("Result: " + str(program.memory[0]))
+    for line in program.profile.report(args.top):
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# Reading many module masses in chunks, shared by the Day 1 batch solutions.
+#
+# Run this file to test it.
+
+try:
+    import numpy
+except ImportError:
+    # Only mass_chunks needs numpy, and says so when it's missing.
+    numpy = None
+from array import array
+from itertools import islice
+
+def mass_chunks(masses, chunk_size):
+    '''
+    Split masses into numpy int64 arrays of at most chunk_size, so only one
+    chunk is held at a time. numpy and array('l') arrays are viewed rather
+    than copied where their type allows, anything else is read as an
+    iterable.
+    '''
+    if numpy is None:
+        raise RuntimeError("numpy is needed to batch masses")
+    if isinstance(masses, (numpy.ndarray, array)):
+        masses = numpy.asarray(masses, dtype=numpy.int64)
+        for start in range(0, len(masses), chunk_size):
+            yield masses[start:start + chunk_size]
+        return
+    iterator = iter(masses)
+    while True:
+        chunk = numpy.fromiter(islice(iterator, chunk_size), dtype=numpy.int64)
+        if not len(chunk):
+            return
+        yield chunk
+
+def do_test():
+    if numpy is None:
+        try:
+            next(mass_chunks([1], 1))
+        except RuntimeError:
+            print("Pass")
+            return
+        raise AssertionError("Missing numpy not reported")
+    for masses in ([1, 2, 3, 4, 5], array('l', [1, 2, 3, 4, 5]), numpy.arange(1, 6)):
+        chunks = [chunk.tolist() for chunk in mass_chunks(masses, 2)]
+        assert chunks == [[1, 2], [3, 4], [5]]
+    assert list(mass_chunks(iter([]), 2)) == []
+    print("Pass")
+
+if __name__ == "__main__":
+    do_test()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# A cache on disk of the answers the day solvers give, used by run.py.
+#
+# An answer is stored under a hash of everything it depends on: the input
+# file's bytes, the source of the solver's file and of any other files in this
+# directory it uses (such as intcode.py), and the solver's name and arguments.
+# Changing any of them gives a new key, so entries never need invalidating;
+# old ones are just evicted, least recently used first, once the cache grows
+# past its size limit.
+#
+# Run this file to test it.
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+CACHE_DIR = os.path.join(ROOT, ".cache", "results")
+
+def source_files(function, root=ROOT):
+    '''
+    The files under root that function's module is made of: its own file and
+    those of the modules it imports from, directly or by name, and so on
+    through everything those import.
+    '''
+    files = set()
+    visited = set()
+    names = [function.__module__]
+    while names:
+        module = sys.modules.get(names.pop())
+        if module is None or module in visited:
+            continue
+        visited.add(module)
+        path = getattr(module, "__file__", None)
+        if path is None or not os.path.abspath(path).startswith(root + os.sep):
+            continue
+        files.add(os.path.abspath(path))
+        for value in vars(module).values():
+            if inspect.ismodule(value):
+                names.append(value.__name__)
+            elif isinstance(getattr(value, "__module__", None), str):
+                names.append(value.__module__)
+    return sorted(files)
+
+def default_path(function):
+    '''
+    The path a solver reads when it isn't given one, or None.
+    '''
+    for parameter in inspect.signature(function).parameters.values():
+        if isinstance(parameter.default, str):
+            return parameter.default
+        return None
+    return None
+
+class ResultCache:
+    '''
+    Answers stored as small JSON files in directory, which is kept under
+    max_bytes by removing the least recently used.
+    '''
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=1 << 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def key(self, function, path=None, parameters=()):
+        '''
+        The key for function's answer when called with path, or its default
+        path when that is None, and any other parameters.
+        '''
+        digest = hashlib.sha256()
+        digest.update((function.__module__ + "." + function.__qualname__ + "\0").encode())
+        digest.update((repr(tuple(parameters)) + "\0").encode())
+        if path is None:
+            path = default_path(function)
+        if path is not None:
+            with open(path, "rb") as in_file:
+                digest.update(hashlib.sha256(in_file.read()).digest())
+        for source in source_files(function):
+            with open(source, "rb") as in_file:
+                digest.update(hashlib.sha256(in_file.read()).digest())
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        '''
+        Give (True, answer) for a cached answer, otherwise (False, None).
+        '''
+        path = self.entry_path(key)
+        try:
+            with open(path) as in_file:
+                answer = json.load(in_file)["answer"]
+        except (OSError, ValueError, KeyError):
+            return False, None
+        # Mark it as recently used.
+        os.utime(path, None)
+        return True, answer
+
+    def put(self, key, answer):
+        '''
+        Store an answer, unless it can't be saved as JSON, then evict.
+        '''
+        try:
+            data = json.dumps({"answer": answer})
+        except TypeError:
+            return
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        # Write and rename, so a reader never sees half a file.
+        handle, temporary = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(handle, "w") as out_file:
+            out_file.write(data)
+        os.replace(temporary, self.entry_path(key))
+        self.evict()
+
+    def evict(self):
+        '''
+        Remove the least recently used entries until the cache fits in
+        max_bytes.
+        '''
+        entries = list()
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            status = os.stat(os.path.join(self.directory, name))
+            entries.append((status.st_mtime, name, status.st_size))
+            total += status.st_size
+        for _, name, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+def do_test():
+    directory = tempfile.mkdtemp()
+    handle, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(handle, "w") as out_file:
+            out_file.write("1,2,3")
+        cache = ResultCache(directory, max_bytes=100)
+        key = cache.key(do_test, path)
+        assert cache.get(key) == (False, None)
+        cache.put(key, 42)
+        assert cache.get(key) == (True, 42)
+        # Anything the answer depends on changes the key.
+        assert cache.key(do_test, path, (1,)) != key
+        assert cache.key(ResultCache.get, path) != key
+        with open(path, "w") as out_file:
+            out_file.write("1,2,4")
+        assert cache.key(do_test, path) != key
+        assert os.path.abspath(__file__) in source_files(do_test)
+        # Answers that aren't JSON aren't cached.
+        cache.put("set", set())
+        assert cache.get("set") == (False, None)
+        # The least recently used entries go first.
+        for number in range(10):
+            cache.put("entry" + str(number), number)
+            os.utime(cache.entry_path("entry" + str(number)), (number, number))
+            cache.get("entry0")
+        remaining = sorted(os.listdir(directory))
+        assert "entry0.json" in remaining and "entry9.json" in remaining
+        assert "entry1.json" not in remaining
+        assert sum(os.path.getsize(os.path.join(directory, name)) for name in remaining) <= 100
+    finally:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+        os.remove(path)
+    # Modules used only through other modules count too.
+    root = os.path.realpath(tempfile.mkdtemp())
+    sources = {
+        "cache_test_a.py": "import cache_test_b\ndef solve():\n    return cache_test_b.solve()\n",
+        "cache_test_b.py": "from cache_test_c import solve\n",
+        "cache_test_c.py": "def solve():\n    return 1\n",
+    }
+    sys.path.insert(0, root)
+    try:
+        for name, source in sources.items():
+            with open(os.path.join(root, name), "w") as out_file:
+                out_file.write(source)
+        import cache_test_a
+        expected = sorted(os.path.join(root, name) for name in sources)
+        assert source_files(cache_test_a.solve, root) == expected
+    finally:
+        sys.path.remove(root)
+        for name in sources:
+            sys.modules.pop(os.path.splitext(name)[0], None)
+        shutil.rmtree(root)
+    print("Pass")
+
+if __name__ == "__main__":
+    do_test()
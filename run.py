@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# Runs the puzzle solutions, timing each part.
+#
+# Each day's solution is a file named after the day, like 4.py or 2_1.py, with
+# part_1 and part_2 functions taking the path to an input file (each has a
+# default, relative to this directory, so the runner works from anywhere). A
+# day's parts can be split between files, like 1_1.py and 1_2.py.
+#
+# For every part run this reports the answer, the wall time, and the peak
+# memory allocated, measured in a second run as tracing allocations slows
+# everything down. Memory allocated by other processes isn't counted. Parts
+# can also be profiled with cProfile, or with a sampling profiler which writes
+# folded stacks for flame graph tools.
+#
+#   python3 run.py                        every part of every day
+#   python3 run.py --day 2 --part 1       one part
+#   python3 run.py --day 3 --input 3=wires.txt
+#   python3 run.py --profile cprofile --json results.jsonl
+#
+# --json appends one line of JSON for the whole run to a file, so results can
+# be tracked over time.
+#
+# Answers are cached, see result_cache.py, so a part whose input and code
+# haven't changed since it last ran isn't run again. --no-cache runs
+# everything, and profiling always does.
+
+import argparse
+import cProfile
+import glob
+import importlib.util
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from result_cache import CACHE_DIR, ResultCache, default_path
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def find_parts(root=ROOT):
+    '''
+    Find every solution, giving {(day, part): (path, function)}.
+    '''
+    parts = dict()
+    for path in sorted(glob.glob(os.path.join(root, "[0-9]*.py"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        day = name.split("_")[0]
+        if not day.isdigit():
+            continue
+        module = load_module(path)
+        for part in (1, 2):
+            function = getattr(module, "part_" + str(part), None)
+            if function is not None:
+                parts.setdefault((int(day), part), (path, function))
+    return parts
+
+def load_module(path):
+    '''
+    Import a solution file, whose name isn't a valid module name. It is added
+    to sys.modules, as an import would, so its functions' modules can be
+    looked up, which result_cache does. It still can't be imported by name,
+    so parts shouldn't use process pools under the spawn or forkserver start
+    methods.
+    '''
+    name = "day_" + os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+class SamplingProfiler:
+    '''
+    Samples the stack of the thread which started it every interval seconds,
+    counting each distinct stack.
+    '''
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.stacks = Counter()
+        self.thread_id = threading.get_ident()
+        self.stopped = threading.Event()
+        self.sampler = threading.Thread(target=self.sample)
+        self.sampler.daemon = True
+
+    def __enter__(self):
+        self.sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.sampler.join()
+
+    def sample(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = list()
+            while frame is not None:
+                code = frame.f_code
+                stack.append(os.path.basename(code.co_filename) + ":" + code.co_name)
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, path):
+        '''
+        Write the samples as folded stacks, one "stack count" per line.
+        '''
+        with open(path, "w") as out_file:
+            for stack, count in self.stacks.most_common():
+                out_file.write(stack + " " + str(count) + "\n")
+
+def run_part(function, path, profile, profile_dir, name):
+    '''
+    Run a part, giving a dict of its results.
+    '''
+    arguments = () if path is None else (path,)
+    result = {"input": path}
+    profile_path = None
+    if profile == "cprofile":
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        answer = profiler.runcall(function, *arguments)
+        result["seconds"] = time.perf_counter() - start
+        profile_path = os.path.join(profile_dir, name + ".prof")
+        profiler.dump_stats(profile_path)
+    elif profile == "sample":
+        with SamplingProfiler() as profiler:
+            start = time.perf_counter()
+            answer = function(*arguments)
+            result["seconds"] = time.perf_counter() - start
+        profile_path = os.path.join(profile_dir, name + ".folded")
+        profiler.write(profile_path)
+    else:
+        start = time.perf_counter()
+        answer = function(*arguments)
+        result["seconds"] = time.perf_counter() - start
+    result["answer"] = answer
+    result["profile"] = profile_path
+    return result
+
+def peak_memory(function, path):
+    arguments = () if path is None else (path,)
+    tracemalloc.start()
+    try:
+        function(*arguments)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def input_path(function, inputs, day):
+    '''
+    The input file to give a part: the one given for its day, otherwise its
+    default, which is relative to this directory rather than wherever the
+    runner was started from. None if it has neither.
+    '''
+    if day in inputs:
+        return inputs[day]
+    path = default_path(function)
+    if path is None:
+        return None
+    return os.path.join(ROOT, path)
+
+def parse_inputs(values):
+    '''
+    Turn ["3=wires.txt"] into {3: "wires.txt"}.
+    '''
+    inputs = dict()
+    for value in values:
+        day, _, path = value.partition("=")
+        if not day.isdigit() or not path:
+            raise SystemExit("Expected --input DAY=PATH, got " + value)
+        inputs[int(day)] = path
+    return inputs
+
+def main():
+    parser = argparse.ArgumentParser(description="Run and time the puzzle solutions.")
+    parser.add_argument("--day", type=int, action="append", help="day to run, can be repeated (default all)")
+    parser.add_argument("--part", type=int, action="append", choices=(1, 2), help="part to run (default both)")
+    parser.add_argument("--input", action="append", default=[], metavar="DAY=PATH", help="input file for a day")
+    parser.add_argument("--profile", choices=("cprofile", "sample"), help="profile each part")
+    parser.add_argument("--profile-dir", default="profiles", help="where to write profiles")
+    parser.add_argument("--no-memory", action="store_true", help="skip the run measuring peak memory")
+    parser.add_argument("--json", help="append the results as a line of JSON to this file")
+    parser.add_argument("--no-cache", action="store_true", help="run every part even if its answer is cached")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="where to cache answers")
+    parser.add_argument("--cache-size", type=int, default=1 << 20, help="bytes of answers to keep")
+    args = parser.parse_args()
+
+    inputs = parse_inputs(args.input)
+    if args.profile:
+        if not os.path.isdir(args.profile_dir):
+            os.makedirs(args.profile_dir)
+    cache = None
+    if not args.no_cache and not args.profile:
+        cache = ResultCache(args.cache_dir, args.cache_size)
+    results = list()
+    for (day, part), (source, function) in sorted(find_parts().items()):
+        if args.day and day not in args.day:
+            continue
+        if args.part and part not in args.part:
+            continue
+        name = "day_" + str(day) + "_part_" + str(part)
+        path = input_path(function, inputs, day)
+        result = {"day": day, "part": part, "file": os.path.basename(source), "cached": False}
+        try:
+            if cache is not None:
+                start = time.perf_counter()
+                key = cache.key(function, path)
+                result["cached"], answer = cache.get(key)
+                if result["cached"]:
+                    result.update({
+                        "input": path, "answer": answer,
+                        "seconds": time.perf_counter() - start, "profile": None,
+                    })
+            if not result["cached"]:
+                result.update(run_part(function, path, args.profile, args.profile_dir, name))
+        except OSError as e:
+            result["error"] = str(e)
+            results.append(result)
+            print("Day " + str(day) + " part " + str(part) + ": couldn't read input, " + str(e))
+            continue
+        if cache is not None and not result["cached"]:
+            cache.put(key, result["answer"])
+        measured = not args.no_memory and not result["cached"]
+        if measured:
+            result["peak_bytes"] = peak_memory(function, path)
+        results.append(result)
+        print(
+            "Day " + str(day) + " part " + str(part) + ": " + str(result["answer"]) +
+            " in " + "%.3f" % result["seconds"] + "s" +
+            (", cached" if result["cached"] else "") +
+            (", peak " + str(result["peak_bytes"]) + " bytes" if measured else "")
+        )
+    if args.json:
+        record = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_implementation() + " " + platform.python_version(),
+            "results": results,
+        }
+        with open(args.json, "a") as out_file:
+            out_file.write(json.dumps(record, default=repr, sort_keys=True) + "\n")
+
+if __name__ == "__main__":
+    main()